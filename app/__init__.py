@@ -40,6 +40,10 @@ def create_app():
     # So if we move them to app/, consistent.
     app = Flask(__name__, static_folder="static", template_folder="templates")
     CORS(app)
+
+    # Spool uploaded files to disk above UPLOAD_SPOOL_MAX_MEMORY
+    from .services.uploads import UploadRequest
+    app.request_class = UploadRequest
     
     # Config
     app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key")
@@ -48,9 +52,41 @@ def create_app():
     from .services.storage import StorageService
     app.storage = StorageService(app)
 
+    from .services.schema_cache import SchemaCache
+    app.schema_cache = SchemaCache(app.storage)
+
+    from .services.result_cache import ResultCache
+    app.result_cache = ResultCache(app.storage.base_path)
+
+    from .services.extraction_cache import ExtractionCache
+    app.extraction_cache = ExtractionCache(app.storage.base_path)
+
+    # Identical concurrent /api/calculate requests share one fetch + score
+    from .services.singleflight import SingleFlight
+    app.score_flights = SingleFlight("score")
+    app.fetch_flights = SingleFlight("fetch")
+
+    # Background jobs: I/O-bound fetches and CPU-bound parsing get separate pools
+    from .services.jobs import JobQueue
+    app.jobs = JobQueue()
+    app.jobs.add_pool("fetch", int(os.getenv("FETCH_WORKERS", "8")))
+    app.jobs.add_pool("score", int(os.getenv("SCORE_WORKERS", "2")))
+    app.jobs.add_pool("extract", int(os.getenv("EXTRACT_WORKERS", "1")))
+    # Each job kind has its own backlog; extractions are long, so fewer may queue
+    app.jobs.set_limit("score", int(os.getenv("JOB_QUEUE_SIZE", "32")))
+    app.jobs.set_limit("extract", int(os.getenv("EXTRACT_QUEUE_SIZE", "4")))
+
+    from .services import metrics
+    metrics.gauge("gate_job_queue_depth", lambda: app.jobs.depth)
+
     from .services.email_service import init_email_service
     init_email_service(app)
     
+    @app.cli.command("rebuild-index")
+    def rebuild_index():
+        """Rebuilds the storage manifest (index.json) from the bucket contents."""
+        app.storage.rebuild_index()
+
     # Blueprints
     from .routes import main_bp
     app.register_blueprint(main_bp)
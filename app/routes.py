@@ -1,16 +1,78 @@
-from flask import Blueprint, request, jsonify, render_template, send_file, current_app
+from flask import Blueprint, Response, g, request, jsonify, render_template, send_file, current_app
 import os
 import io
-from .services import extraction, scoring, email_service
+import json
+import time
+import zlib
+from .services import batch, extraction, fetcher, metrics, profiler, schema_bin, scoring, scoring_pool, email_service, uploads
+from .services.jobs import QueueFull
+from .services.singleflight import SharedStream
+from .services.storage import StorageError
 
 main_bp = Blueprint('main', __name__)
 
 ADMIN_PIN = os.getenv("ADMIN_PIN")
+ASYNC_SCORING = os.getenv("ASYNC_SCORING", "false").lower() in ("1", "true", "yes")
+
+# Requests sampled by the profiler once they pass PROFILE_THRESHOLD
+PROFILED_ENDPOINTS = {"main.calculate", "main.upload_paper"}
+
+def invalidate_paper(year, code):
+    """Drops cached schema and score reports after a live paper changes."""
+    current_app.schema_cache.invalidate(year, code)
+    current_app.result_cache.invalidate(year, code)
+
+@main_bp.before_app_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    if request.endpoint in PROFILED_ENDPOINTS:
+        g.profile = profiler.start(request.endpoint.split(".")[-1])
+
+@main_bp.after_app_request
+def record_latency(response):
+    # Streamed bodies are timed until their headers are ready
+    started = g.pop("request_started", None)
+    if started is not None and request.endpoint:
+        metrics.observe("gate_request_seconds", time.perf_counter() - started, endpoint=request.endpoint)
+    return response
+
+def profile_params():
+    """Request fields worth keeping next to a profile (file names and sizes, not contents)."""
+    params = {"method": request.method, "args": request.args.to_dict()}
+    # Only already-parsed bodies are read here: parsing a form now would bypass uploads.limit
+    form = request.__dict__.get("form")
+    if form:
+        params["form"] = form.to_dict()
+    files = request.__dict__.get("files")
+    if files:
+        params["files"] = {name: f.filename for name, f in files.items()}
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            params["json"] = {k: v for k, v in body.items() if not isinstance(v, (str, list, dict)) or len(v) <= 1000}
+    if request.content_length:
+        params["content_length"] = request.content_length
+    return params
+
+@main_bp.teardown_app_request
+def save_profile(error=None):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profiler.stop(profile, profile_params() if profile.samples else None)
+
+@main_bp.app_errorhandler(413)
+def too_large(e):
+    return jsonify({"error": f"Request too large (uploads are limited to {uploads.MAX_BYTES // (1024 * 1024)} MB)"}), 413
 
 @main_bp.route('/api/ping')
 def ping():
     return jsonify({"status": "alive"}), 200
 
+@main_bp.route('/api/metrics')
+def metrics_endpoint():
+    """Prometheus text format, summed over every worker and pool process."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @main_bp.route('/')
 def index():
     return render_template('index.html')
@@ -29,19 +91,27 @@ def contribute():
 
 @main_bp.route('/api/detect_metadata', methods=['POST'])
 def detect_meta():
+    uploads.limit(request)
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
     
-    # Read file into memory
-    file_bytes = file.read()
-    file_stream = io.BytesIO(file_bytes)
+    # The spooled upload buffer is read in place (memory or temp file)
+    file_stream = file.stream
+    file_stream.seek(0)
     
     try:
-        # extraction.detect_metadata now supports streams
-        meta = extraction.detect_metadata(file_stream, filename=file.filename)
+        # The same PDF is often dropped in more than once; reuse the last result
+        cache = current_app.extraction_cache
+        cache_key = cache.key("metadata", file_stream, file.filename)
+        meta = cache.get(cache_key)
+        if meta is None:
+            # extraction.detect_metadata now supports streams
+            with metrics.span("detect_metadata"):
+                meta = extraction.detect_metadata(file_stream, filename=file.filename)
+            cache.put(cache_key, meta)
         return jsonify(meta)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -49,6 +119,7 @@ def detect_meta():
 @main_bp.route('/api/upload_paper', methods=['POST'])
 def upload_paper():
     storage = current_app.storage
+    uploads.limit(request)
     
     if 'answer_key' not in request.files:
         return jsonify({"error": "Answer Key file is required"}), 400
@@ -76,96 +147,340 @@ def upload_paper():
     key_path = f"{base_dir}/answer_key.pdf"
     paper_path = f"{base_dir}/question_paper.pdf"
     
-    # Read files to memory
-    key_bytes = key_file.read()
-    paper_bytes = None
-    if paper_file:
-        paper_bytes = paper_file.read()
+    # One buffer per file (memory up to UPLOAD_SPOOL_MAX_MEMORY, then disk) feeds
+    # storage, the cache key and extraction. Detached so the extraction job can
+    # keep reading after the request closes its files; the job closes them.
+    key_stream = uploads.detach(key_file)
+    paper_stream = uploads.detach(paper_file) if paper_file else None
+    if key_stream is None:
+        uploads.close_all(paper_stream)
+        return jsonify({"error": "Answer Key file is empty"}), 400
 
     try:
         # 1. Save Files via Storage
-        storage.save(key_path, key_bytes)
-        if paper_bytes:
-            storage.save(paper_path, paper_bytes)
-        
-        # 2. Extract Key from Memory Stream
-        key_stream = io.BytesIO(key_bytes)
-        paper_stream = io.BytesIO(paper_bytes) if paper_bytes else None
-        schema = extraction.extract_answer_key(key_stream, paper_code=code, paper_source=paper_stream)
-        
-        # 3. Save Schema
-        schema_path = f"{base_dir}/schema.json"
-        storage.save_json(schema_path, schema)
-        
-        if mode == 'live':
-             return jsonify({"message": f"Successfully published {code} ({year}) to LIVE!"})
-        else:
-            # Prepare attachments for email (bytes)
-            # No attachments sent to save memory on free tier
-            email_service.send_approval_email_async(year, code, attachments=None)
-            return jsonify({"message": f"Submitted {code} ({year}) for review!"})
-
+        storage.save(key_path, key_stream)
+        if paper_stream:
+            storage.save(paper_path, paper_stream)
     except Exception as e:
         import traceback
         traceback.print_exc()
+        uploads.close_all(key_stream, paper_stream)
         return jsonify({"error": str(e)}), 500
 
+    # 2. Extract in the background; schema.json and the email only happen once it succeeds
+    app = current_app._get_current_object()
+    jobs = current_app.jobs
+    cache = current_app.extraction_cache
+    cache_key = cache.key("schema", key_stream, paper_stream, code)
+
+    def publish(schema):
+        # 3. Save Schema (schema.json plus its packed schema.bin), then list the paper
+        schema_bin.save(storage, base_dir, schema)
+        storage.index_paper(base_dir)
+
+        if mode == 'live':
+            with app.app_context():
+                invalidate_paper(year, code)
+            return {"message": f"Successfully published {code} ({year}) to LIVE!"}
+
+        # No attachments sent to save memory on free tier
+        email_service.send_approval_email_async(year, code, attachments=None)
+        return {"message": f"Submitted {code} ({year}) for review!"}
+
+    # Same PDFs extracted before (re-upload, staging then live): skip the job
+    cached = cache.get(cache_key)
+    if cached:
+        print(f"[DEBUG] Extraction cache hit for {code} ({year})")
+        uploads.close_all(key_stream, paper_stream)
+        try:
+            return jsonify(publish(cached)), 200
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return jsonify({"error": str(e)}), 500
+
+    def extract_stage(job_id, _):
+        def progress(stage, page, pages):
+            jobs.update(job_id, progress={"stage": stage, "page": page, "pages": pages})
+
+        try:
+            with profiler.watch("upload_paper.extract", year=year, code=code, mode=mode,
+                                answer_key=key_file.filename, question_paper=paper_file and paper_file.filename):
+                schema = extraction.extract_answer_key(key_stream, paper_code=code, paper_source=paper_stream, progress=progress)
+        finally:
+            uploads.close_all(key_stream, paper_stream)
+        if not schema:
+            raise ValueError("No answer key tables found in the PDF")
+        cache.put(cache_key, schema)
+
+        jobs.update(job_id, progress={"stage": "saving"})
+        return publish(schema)
+
+    try:
+        job_id = jobs.submit("extract", [("extract", extract_stage)], year=year, code=code, mode=mode)
+    except QueueFull as e:
+        uploads.close_all(key_stream, paper_stream)
+        res = jsonify({"error": str(e)})
+        res.headers["Retry-After"] = str(e.retry_after)
+        return res, 429
+
+    return jsonify({
+        "message": f"Uploaded {code} ({year}), extracting answer key...",
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}"
+    }), 202
+
 @main_bp.route('/api/papers', methods=['GET'])
 def list_papers():
     storage = current_app.storage
-    tree = {}
-    
-    # List Years in 'live'
-    years = storage.list("live")
-    for year in years:
-        tree[year] = []
-        # List Codes in 'live/year'
-        codes = storage.list(f"live/{year}")
-        for code in codes:
-            # Check if schema exists
-            if storage.exists(f"live/{year}/{code}/schema.json"):
-                tree[year].append(code)
-    
+    # Served from the storage manifest: {year: [codes with a schema]}
+    tree = storage.list_papers("live", require="schema.json")
     return jsonify(tree)
 
+def read_sheet_body(req):
+    """
+    Returns the response-sheet HTML sent as the raw request body, inflating
+    gzip (Content-Encoding: gzip or application/gzip). Both the body and the
+    decoded HTML are capped at FETCH_MAX_BYTES (uploads.TooLarge above it).
+    """
+    body = uploads.read_limited(req.stream, fetcher.MAX_BYTES)
+    if req.content_encoding == 'gzip' or req.mimetype in ('application/gzip', 'application/x-gzip'):
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        html = inflater.decompress(body, fetcher.MAX_BYTES + 1)
+        if len(html) > fetcher.MAX_BYTES or inflater.unconsumed_tail:
+            raise uploads.TooLarge(f"Response sheet exceeds {fetcher.MAX_BYTES} bytes")
+        return html
+    return body
+
+def flag(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+def report_response(report, summary_only=False, stream=False):
+    """A full report as JSON, only its summary, or NDJSON lines when streaming."""
+    if summary_only:
+        report = {"summary": report["summary"]}
+    if stream:
+        return stream_report(report["summary"], report.get("details", ()))
+    return jsonify(report)
+
+def stream_report(summary, details):
+    """
+    NDJSON: a {"type": "summary"} line first, then one {"type": "detail"}
+    line per question, so clients can render the score before the table.
+    """
+    def generate():
+        yield json.dumps({"type": "summary", "summary": summary}) + "\n"
+        for item in details:
+            yield json.dumps({"type": "detail", **item}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
 @main_bp.route('/api/calculate', methods=['POST'])
 def calculate():
-    storage = current_app.storage
-    data = request.json
+    # Sources: JSON {url}, multipart with a saved 'sheet' HTML file, or the
+    # raw (optionally gzipped) HTML as the body with year/paper_code in the query.
+    # Options: summary_only (no per-question details) and stream (NDJSON,
+    # summary line first; also chosen by Accept: application/x-ndjson).
+    # Every sheet body (file part, raw or gzipped) is capped at FETCH_MAX_BYTES
+    html = None
+    uploads.limit(request)
+    try:
+        if request.files or request.form:
+            data = request.form
+            sheet = request.files.get('sheet')
+            if sheet:
+                html = uploads.read_limited(sheet.stream, fetcher.MAX_BYTES)
+        elif request.mimetype in ('text/html', 'application/gzip', 'application/x-gzip') or request.content_encoding == 'gzip':
+            data = request.args
+            html = read_sheet_body(request)
+        else:
+            data = request.json
+    except uploads.TooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except (ValueError, zlib.error) as e:
+        return jsonify({"error": f"Invalid response sheet upload: {e}"}), 400
     url = data.get('url')
     year = data.get('year')
     code = data.get('paper_code')
     
-    if not all([url, year, code]):
-        return jsonify({"error": "Missing required fields (url, year, code)"}), 400
-    
-    schema_path = f"live/{year}/{code}/schema.json"
+    if not (year and code and (url or html)):
+        return jsonify({"error": "Missing required fields (url or sheet, year, code)"}), 400
     
-    if not storage.exists(schema_path):
-        return jsonify({"error": "Paper not found on server."}), 404
-        
     try:
-        print(f"[DEBUG] Reading schema from: {schema_path}")
-        schema = storage.read_json(schema_path)
+        with metrics.span("schema_lookup"):
+            schema = current_app.schema_cache.get(year, code)
         if not schema:
-             print("[ERROR] Schema not found or empty.")
-             return jsonify({"error": "Failed to read schema."}), 500
+            return jsonify({"error": "Paper not found on server."}), 404
         
         print(f"[DEBUG] Schema keys count: {len(schema)}")
+        is_async = flag(data.get('async', ASYNC_SCORING))
+        summary_only = flag(data.get('summary_only', False))
+        stream = flag(data.get('stream', False)) or \
+            request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+        if html is not None:
+            # Uploaded sheet: parsed straight from the request buffer, no fetch
+            if is_async:
+                return submit_score_job(None, schema, html=html, summary_only=summary_only)
+            if stream and not summary_only:
+                return stream_report(*scoring_pool.score_iter(html, schema))
+            report = scoring_pool.score(html, schema, details=not summary_only)
+            print(f"[DEBUG] Calculation success. Score: {report['summary']['total_score']}")
+            return report_response(report, stream=stream)
+
+        cacheable = url.startswith("http")
+        report = current_app.result_cache.get(url, schema) if cacheable else None
+        if report is not None:
+            print(f"[DEBUG] Result cache hit for URL: {url}")
+            return report_response(report, summary_only, stream)
+
+        if is_async:
+            return submit_score_job(url, schema, summary_only=summary_only)
+
         print(f"[DEBUG] Calculating score for URL: {url}")
-        
-        report = scoring.calculate_score(url, schema)
-        if "error" in report:
-            print(f"[ERROR] Calculation failed: {report['error']}")
-            return jsonify(report), 500
-            
-        print(f"[DEBUG] Calculation success. Score: {report['summary']['total_score']}")
-        return jsonify(report)
+
+        result_cache = current_app.result_cache
+        flight = (url, schema.year, schema.code, schema.version, summary_only)
+
+        if summary_only:
+            # Summary-only reports are not cached: a later full request needs the details
+            report = current_app.score_flights.do(
+                flight, lambda: scoring_pool.calculate_score(url, schema, details=False))
+            if "error" in report:
+                print(f"[ERROR] Calculation failed: {report['error']}")
+                return jsonify(report), 500
+            print(f"[DEBUG] Calculation success. Score: {report['summary']['total_score']}")
+            return report_response(report, stream=stream)
+
+        def fetch_and_score():
+            try:
+                html = scoring.load_sheet(url)
+            except Exception as e:
+                print(f"[ERROR] Failed to fetch URL: {e}")
+                return {"error": str(e)}
+            summary, details = scoring_pool.score_iter(html, schema)
+
+            def cache(items):
+                if cacheable:
+                    result_cache.put(url, schema, {"summary": summary, "details": items})
+
+            return SharedStream(summary, details, cache)
+
+        # Concurrent requests for the same sheet (a shared link) wait on one
+        # fetch + parse + score. The detail rows are built lazily, once, by
+        # whichever response reads furthest ahead, so a streamed leader still
+        # sends rows as they are built and followers read the same rows
+        shared = current_app.score_flights.do(flight, fetch_and_score)
+        if isinstance(shared, dict):
+            print(f"[ERROR] Calculation failed: {shared['error']}")
+            return jsonify(shared), 500
+
+        print(f"[DEBUG] Calculation success. Score: {shared.head['total_score']}")
+        if stream:
+            return stream_report(shared.head, iter(shared))
+        return jsonify({"summary": shared.head, "details": shared.all()})
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def submit_score_job(url, schema, html=None, summary_only=False):
+    """Queues fetch + score on the background pools and answers 202 with a job id."""
+    result_cache = current_app.result_cache
+
+    fetch_flights = current_app.fetch_flights
+
+    def fetch_stage(job_id, _):
+        with profiler.watch("calculate.fetch", url=url, year=schema.year, code=schema.code):
+            # Waits for a host slot behind interactive requests instead of failing fast
+            return fetch_flights.do((url, "queued"), lambda: scoring.load_sheet(url, queued=True))
+
+    def score_stage(job_id, html):
+        with profiler.watch("calculate.score", url=url, year=schema.year, code=schema.code,
+                            summary_only=summary_only, html_bytes=len(html)):
+            report = scoring_pool.score(html, schema, details=not summary_only)
+        if url and url.startswith("http") and not summary_only:
+            result_cache.put(url, schema, report)
+        return report
+
+    if html is not None:
+        stages = [("score", lambda job_id, _: score_stage(job_id, html))]
+    else:
+        stages = [("fetch", fetch_stage), ("score", score_stage)]
+
+    try:
+        job_id = current_app.jobs.submit("score", stages)
+    except QueueFull as e:
+        res = jsonify({"error": str(e)})
+        res.headers["Retry-After"] = str(e.retry_after)
+        return res, 429
+
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}), 202
+
+@main_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = current_app.jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job)
+
+@main_bp.route('/api/calculate_batch', methods=['POST'])
+def calculate_batch():
+    """
+    Scores many response sheets for one paper. Accepts JSON
+    {year, paper_code, urls: [...]} or multipart with year, paper_code, urls
+    (one per line) and sheets (HTML files). Streams NDJSON: one line per sheet
+    as it finishes, then an aggregate line. With summary_only, sheet lines
+    carry only the summary and the aggregate has no per-question rates.
+    """
+    uploads.limit(request)
+    if request.files or request.form:
+        year = request.form.get('year')
+        code = request.form.get('paper_code')
+        urls = [line.strip() for field in request.form.getlist('urls') for line in field.splitlines() if line.strip()]
+        # Each sheet keeps its spooled buffer (None when empty); the worker scoring it reads it
+        sheets = [(f.filename, uploads.detach(f)) for f in request.files.getlist('sheets')]
+        summary_only = flag(request.form.get('summary_only', False))
+    else:
+        data = request.get_json(silent=True) or {}
+        year = data.get('year')
+        code = data.get('paper_code')
+        urls = data.get('urls') or []
+        sheets = []
+        summary_only = flag(data.get('summary_only', False))
+    streams = [payload for _, payload in sheets if payload is not None]
+
+    error = None
+    items = [(url, url) for url in urls] + sheets
+    if not (year and code):
+        error = jsonify({"error": "Missing required fields (year, paper_code)"}), 400
+    elif not items:
+        error = jsonify({"error": "Provide urls or sheets to score"}), 400
+    elif len(items) > batch.MAX_ITEMS:
+        error = jsonify({"error": f"Batch limited to {batch.MAX_ITEMS} sheets"}), 413
+    elif any(not str(url).startswith("http") for url in urls):
+        error = jsonify({"error": "Only http(s) response-sheet URLs are accepted"}), 400
+    else:
+        with metrics.span("schema_lookup"):
+            schema = current_app.schema_cache.get(year, code)
+        if not schema:
+            error = jsonify({"error": "Paper not found on server."}), 404
+    if error:
+        uploads.close_all(*streams)
+        return error
+
+    result_cache = current_app.result_cache
+
+    def generate():
+        try:
+            for row in batch.run_batch(items, schema, result_cache, details=not summary_only):
+                yield json.dumps(row) + "\n"
+        finally:
+            uploads.close_all(*streams)
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
 @main_bp.route('/api/check_paper_exists', methods=['GET'])
 def check_paper_exists():
     storage = current_app.storage
@@ -188,6 +503,16 @@ def staging_file():
         return "Missing parameters", 400
         
     path = f"staging/{year}/{code}/{filename}"
+
+    # Served from a file on disk (local data/ or the Supabase disk cache) so
+    # the server can use sendfile instead of copying through Python
+    local = storage.local_path(path)
+    if local:
+        try:
+            return send_file(local, download_name=filename, as_attachment=False)
+        except OSError:
+            pass  # Evicted from the cache meanwhile; fall back to a direct read
+
     data = storage.read(path)
     
     if not data:
@@ -215,7 +540,12 @@ def approve_token(token):
              return "Error: Paper not found in staging", 404
 
         storage.move(src, dst)
+        schema_bin.backfill(storage, dst)
+        invalidate_paper(year, code)
         return f"<h1>Success!</h1><p>Paper {code} ({year}) has been approved and is now LIVE.</p><a href='/'>Go to App</a>"
+    except StorageError as e:
+        invalidate_paper(year, code)
+        return f"Approval failed: {str(e)}", 500
     except Exception as e:
         return f"Invalid or Expired Token: {str(e)}", 400
 
@@ -224,9 +554,7 @@ def staging_queue():
     storage = current_app.storage
     queue = []
     
-    years = storage.list("staging")
-    for year in years:
-        codes = storage.list(f"staging/{year}")
+    for year, codes in storage.list_papers("staging").items():
         for code in codes:
              queue.append({"year": year, "code": code})
              
@@ -261,8 +589,14 @@ def approve_paper():
     if not storage.exists(f"{src}/schema.json"):
         return jsonify({"error": "Not found"}), 404
         
-    storage.move(src, dst)
-    return jsonify({"message": "Approved"})
+    try:
+        results = storage.move(src, dst)
+    except StorageError as e:
+        invalidate_paper(year, code)
+        return jsonify({"error": str(e), "results": e.results}), 500
+    schema_bin.backfill(storage, dst)
+    invalidate_paper(year, code)
+    return jsonify({"message": "Approved", "results": results})
 
 @main_bp.route('/api/reject_paper', methods=['POST'])
 def reject_paper():
@@ -277,17 +611,18 @@ def reject_paper():
     
     # storage.delete removes files/folders
     # We should delete the folder
-    storage.delete(src)
-    return jsonify({"message": "Rejected"})
+    try:
+        results = storage.delete(src)
+    except StorageError as e:
+        return jsonify({"error": str(e), "results": e.results}), 500
+    return jsonify({"message": "Rejected", "results": results})
 
 @main_bp.route('/api/live_papers', methods=['GET'])
 def live_papers():
     storage = current_app.storage
     papers = []
     
-    years = storage.list("live")
-    for year in years:
-        codes = storage.list(f"live/{year}")
+    for year, codes in storage.list_papers("live").items():
         for code in codes:
             papers.append({"year": year, "code": code})
             
@@ -305,7 +640,11 @@ def delete_live_paper():
     
     target = f"live/{year}/{code}"
     try:
-        storage.delete(target)
-        return jsonify({"message": f"Deleted {code} ({year}) from Live."})
+        results = storage.delete(target)
+        invalidate_paper(year, code)
+        return jsonify({"message": f"Deleted {code} ({year}) from Live.", "results": results})
+    except StorageError as e:
+        invalidate_paper(year, code)
+        return jsonify({"error": str(e), "results": e.results}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
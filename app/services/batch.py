@@ -0,0 +1,117 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import fetcher, scoring, scoring_pool, uploads
+
+FANOUT = int(os.getenv("BATCH_FANOUT", "8"))
+MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class BatchStats:
+    """Accumulates scores and per-question outcomes across a batch."""
+    def __init__(self):
+        self.scores = []
+        self.failed = 0
+        self.questions = {}  # ref -> [attempted, correct]
+
+    def add(self, report):
+        self.scores.append(report["summary"]["total_score"])
+        for item in report.get("details", ()):
+            counts = self.questions.setdefault(item["Q"], [0, 0])
+            if item["Result"] != "Unattempted":
+                counts[0] += 1
+            if item["Result"] == "Correct":
+                counts[1] += 1
+
+    def summary(self):
+        scores = sorted(self.scores)
+        n = len(scores)
+        return {
+            "type": "aggregate",
+            "scored": n,
+            "failed": self.failed,
+            "mean": sum(scores) / n if n else None,
+            "min": scores[0] if n else None,
+            "max": scores[-1] if n else None,
+            "p25": percentile(scores, 25),
+            "p50": percentile(scores, 50),
+            "p75": percentile(scores, 75),
+            "p90": percentile(scores, 90),
+            "p99": percentile(scores, 99),
+            "questions": {
+                ref: {
+                    "attempted": attempted,
+                    "correct": correct,
+                    "attempt_rate": attempted / n if n else 0.0,
+                    "correct_rate": correct / n if n else 0.0,
+                }
+                for ref, (attempted, correct) in self.questions.items()
+            },
+        }
+
+
+def checked(report):
+    """A sheet with no question tables is not a response sheet; it is reported as an error, not a 0."""
+    if not report["summary"]["total_questions"]:
+        raise ValueError("No questions found in response sheet")
+    return report
+
+
+def run_batch(items, schema, result_cache=None, details=True):
+    """
+    Scores every item against one prepared schema and yields result dicts as
+    they finish, then a final aggregate. items: list of (source, payload)
+    where a payload is a URL to fetch, sheet bytes, an uploaded sheet's
+    buffer (read by the worker that scores it, capped at the fetch size limit)
+    or None for an empty upload. Empty and unparseable sheets are reported
+    as per-item errors and left out of the aggregate, like failed fetches.
+    details=False scores summaries only (and leaves the result cache unfilled).
+    """
+    stats = BatchStats()
+
+    def work(source, payload):
+        if isinstance(payload, str):
+            if result_cache:
+                cached = result_cache.get(payload, schema)
+                if cached is not None:
+                    return cached if details else {"summary": cached["summary"]}
+            # Queued behind interactive requests for the result host's slots
+            html = scoring.load_sheet(payload, queued=True)
+            report = checked(scoring_pool.score(html, schema, details))
+            if result_cache and details:
+                result_cache.put(payload, schema, report)
+            return report
+        if payload is None:
+            raise ValueError("Empty response sheet")
+        if not isinstance(payload, bytes):
+            payload = uploads.read_limited(payload, fetcher.MAX_BYTES)
+        return checked(scoring_pool.score(payload, schema, details))
+
+    ex = ThreadPoolExecutor(max_workers=FANOUT, thread_name_prefix="batch")
+    try:
+        futures = {ex.submit(work, source, payload): (idx, source) for idx, (source, payload) in enumerate(items)}
+        for future in as_completed(futures):
+            idx, source = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                stats.failed += 1
+                yield {"type": "result", "index": idx, "source": source, "error": str(e)}
+                continue
+            stats.add(report)
+            yield {"type": "result", "index": idx, "source": source, **report}
+    finally:
+        # A client that disconnects closes this generator; drop the sheets not
+        # started yet instead of fetching and scoring them for nobody
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    yield stats.summary()
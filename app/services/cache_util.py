@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class LRU:
+    """Thread-safe mapping holding at most max_entries; inserting past that drops the least recently used."""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """The value for key (marking it recently used), or default."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def discard_if(self, predicate):
+        """Removes every entry whose value matches predicate(value)."""
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if predicate(v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Opens a temp file next to path and renames it over path when the block
+    exits cleanly, so readers (other threads or gunicorn workers) see either
+    the old file or the complete new one. The temp file is removed on error.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
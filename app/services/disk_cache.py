@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+from .cache_util import atomic_write
+
+COPY_CHUNK = 1024 * 1024
+
+
+class DiskCache:
+    """
+    Size-capped LRU directory of bucket objects for Supabase mode. Objects are
+    stored at their bucket path under root, each with a <name>.meta.json
+    sidecar holding its etag. File mtime is the LRU clock (bumped on every
+    hit), so gunicorn workers sharing the directory agree on what is oldest.
+    """
+    META_SUFFIX = ".meta.json"
+
+    def __init__(self, root, max_bytes, fresh_for=2.0):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        # Entries validated this recently are served without asking the bucket
+        self.fresh_for = fresh_for
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._scan())
+
+    def file_path(self, path):
+        """Local file for an object path, or None if the path is not cacheable."""
+        parts = [p for p in path.strip("/").split("/") if p]
+        if not parts or any(p in (".", "..") or p.endswith(self.META_SUFFIX) for p in parts):
+            return None
+        return os.path.join(self.root, *parts)
+
+    def lookup(self, path):
+        """Returns the entry's metadata ({"etag", "validated_at", "size"}) if the file is cached."""
+        local = self.file_path(path)
+        if local is None:
+            return None
+        try:
+            with open(local + self.META_SUFFIX, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(local):
+            return None
+        return meta
+
+    def is_fresh(self, meta):
+        return time.time() - meta.get("validated_at", 0) < self.fresh_for
+
+    def touch(self, path, meta=None):
+        """Marks a hit (LRU) and, when meta is given, records a fresh validation."""
+        local = self.file_path(path)
+        try:
+            os.utime(local)
+            if meta is not None:
+                self._write_meta(local, dict(meta, validated_at=time.time()))
+        except OSError:
+            pass
+
+    def store(self, path, data, etag):
+        """Writes bytes or a binary stream as the cached copy of path; returns the local file."""
+        local = self.file_path(path)
+        if local is None:
+            return None
+        old_size = os.path.getsize(local) if os.path.isfile(local) else 0
+        with atomic_write(local, "wb") as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                data.seek(0)
+                shutil.copyfileobj(data, f, COPY_CHUNK)
+                data.seek(0)
+            size = f.tell()
+        self._write_meta(local, {"etag": etag, "validated_at": time.time(), "size": size})
+
+        with self._lock:
+            self._bytes += size - old_size
+            over = self._bytes > self.max_bytes
+        if over:
+            self._evict(keep=local)
+        return local
+
+    def drop(self, prefix):
+        """Removes the cached object or folder at prefix."""
+        local = self.file_path(prefix)
+        if local is None:
+            return
+        if os.path.isdir(local):
+            shutil.rmtree(local, ignore_errors=True)
+        else:
+            for name in (local, local + self.META_SUFFIX):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+        with self._lock:
+            self._bytes = sum(size for _, _, size in self._scan())
+
+    @staticmethod
+    def _write_meta(local, meta):
+        with atomic_write(local + DiskCache.META_SUFFIX) as f:
+            json.dump(meta, f)
+
+    def _scan(self):
+        """(mtime, file, size) for every cached object file."""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(self.META_SUFFIX) or name.endswith(".tmp"):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, full, st.st_size))
+        return entries
+
+    def _evict(self, keep=None):
+        """Drops least recently used files until the cache is at 90% of its cap."""
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, full, size in entries:
+            if total <= target:
+                break
+            if full == keep:
+                continue
+            for name in (full, full + self.META_SUFFIX):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+            total -= size
+        with self._lock:
+            self._bytes = total
@@ -1,10 +1,38 @@
-import pdfplumber
 import json
 import re
 
-def extract_marks_from_paper(source):
+from . import metrics, pdf_text
+from .extraction_pool import map_pages
+
+
+def page_rows(page):
+    """Answer-key table rows of one page, header rows and short rows dropped."""
+    rows = []
+    for table in page.extract_tables():
+        # Skip header row if it contains "Q.No." or "Question No"
+        start_idx = 0
+        if table[0][0] and ("No" in table[0][0] or "Session" in table[0][0]):
+            start_idx = 1
+
+        for row in table[start_idx:]:
+            if not row or len(row) < 4:
+                continue
+            rows.append(row)
+    return rows
+
+
+MARKS_PATTERN = re.compile(r"Q\.(\d+)[^\d]+Q\.(\d+)\s+Carry\s+(ONE|TWO)\s+mark", re.IGNORECASE)
+
+# detect_metadata reads this top fraction of page 0 first; title, year and
+# paper code sit in the header, so the rest of the page is rarely needed.
+HEADER_FRACTION = 0.3
+
+
+def extract_marks_from_paper(source, progress=None, needed=None):
     """
     Extracts mappings of Question Number -> Marks (1.0 or 2.0) from the Question Paper text.
+    progress: optional callback(stage, page, pages)
+    needed: optional set of str(q_no); scanning stops once all of them are mapped
     Returns: dict mapping str(q_no) -> float(marks)
     """
     marks_map = {}
@@ -16,16 +44,19 @@ def extract_marks_from_paper(source):
         source.seek(0)
         
     try:
-        with pdfplumber.open(source) as pdf:
-            text = "".join(page.extract_text() or "" for page in pdf.pages)
+        # Pages are read lazily and only as plain text (no word clustering)
+        for page_no, total, text in pdf_text.page_texts(source):
+            if progress:
+                progress("question_paper", page_no, total)
             # Find Q.X - Q.Y Carry ONE/TWO mark
-            matches = re.finditer(r"Q\.(\d+)[^\d]+Q\.(\d+)\s+Carry\s+(ONE|TWO)\s+mark", text, re.IGNORECASE)
-            for m in matches:
+            for m in MARKS_PATTERN.finditer(text):
                 start = int(m.group(1))
                 end = int(m.group(2))
                 mark_val = 1.0 if m.group(3).upper() == "ONE" else 2.0
                 for q in range(start, end + 1):
                     marks_map[str(q)] = mark_val
+            if needed is not None and needed.issubset(marks_map):
+                break
     except Exception as e:
         print(f"Error extracting marks from question paper: {e}")
 
@@ -35,70 +66,66 @@ def extract_marks_from_paper(source):
     
     return marks_map
 
-def extract_answer_key(source, output_path=None, paper_code=None, paper_source=None):
+def extract_answer_key(source, output_path=None, paper_code=None, paper_source=None, progress=None):
     """
     source: filepath (str) or file-like object (BytesIO)
+    progress: optional callback(stage, page, pages) for background jobs
     """
     schema = {}
-    
+
+    # Rows come back in page order whether pages ran sequentially or sharded
+    # across the extraction pool, so the merge below is deterministic.
+    with metrics.span("extract_tables"):
+        rows = [row for page in map_pages(source, "rows", "answer_key", progress) for row in page]
+
+    # Only the 2026 four-column layout takes marks from the question paper
     marks_map = {}
-    if paper_source:
+    needed = {str(row[0]) for row in rows if len(row) < 6}
+    if paper_source and needed:
         print("Extracting marks from question paper...")
-        marks_map = extract_marks_from_paper(paper_source)
+        with metrics.span("extract_marks"):
+            marks_map = extract_marks_from_paper(paper_source, progress=progress, needed=needed)
+
+    for row in rows:
+        if len(row) >= 6:
+            # Old Row format: [Q.No, Session, Que.Type, Sec. Name, Key, Marks]
+            q_no = row[0]
+            q_type = row[2]
+            section = row[3]
+            key = row[4]
+            marks = row[5]
+        else:
+            # New 2026 Row format: ['Q. No.', 'Q. Type', 'Section', 'Key/Range']
+            q_no = row[0]
+            q_type = row[1]
+            section = row[2]
+            key = row[3]
+            # Fetch mark from question paper extract
+            marks = marks_map.get(str(q_no), 1.0) # default to 1.0 if not found
+
+        # Standardize Section Name for Regex Matching (GA, CS, DA, etc.)
+        raw_section = section.strip()
+        clean_section = raw_section
         
-    # pdfplumber.open supports both path and file-like objects
-    with pdfplumber.open(source) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                # Skip header row if it contains "Q.No." or "Question No"
-                start_idx = 0
-                if table[0][0] and ("No" in table[0][0] or "Session" in table[0][0]):
-                    start_idx = 1
-                
-                for row in table[start_idx:]:
-                    if not row or len(row) < 4:
-                        continue
-                    
-                    if len(row) >= 6:
-                        # Old Row format: [Q.No, Session, Que.Type, Sec. Name, Key, Marks]
-                        q_no = row[0]
-                        q_type = row[2]
-                        section = row[3]
-                        key = row[4]
-                        marks = row[5]
-                    else:
-                        # New 2026 Row format: ['Q. No.', 'Q. Type', 'Section', 'Key/Range']
-                        q_no = row[0]
-                        q_type = row[1]
-                        section = row[2]
-                        key = row[3]
-                        # Fetch mark from question paper extract
-                        marks = marks_map.get(str(q_no), 1.0) # default to 1.0 if not found
-
-                    # Standardize Section Name for Regex Matching (GA, CS, DA, etc.)
-                    raw_section = section.strip()
-                    clean_section = raw_section
-                    
-                    # 1. General Aptitude -> GA
-                    if "general aptitude" in raw_section.lower():
-                        clean_section = "GA"
-                    # 2. If we have a paper_code (e.g. CS) and section is NOT GA, assume it's the subject
-                    # This handles "Computer Science..." -> "CS"
-                    elif paper_code and raw_section.lower() != "ga":
-                        # If the raw section is the full name or matches code
-                        clean_section = paper_code
-
-                    schema_key = f"{clean_section}_{q_no}"
-                    
-                    schema[schema_key] = {
-                        "question_no": int(q_no),
-                        "section": clean_section,
-                        "original_section": raw_section,
-                        "question_type": q_type,
-                        "key": key,
-                        "marks": float(marks)
-                    }
+        # 1. General Aptitude -> GA
+        if "general aptitude" in raw_section.lower():
+            clean_section = "GA"
+        # 2. If we have a paper_code (e.g. CS) and section is NOT GA, assume it's the subject
+        # This handles "Computer Science..." -> "CS"
+        elif paper_code and raw_section.lower() != "ga":
+            # If the raw section is the full name or matches code
+            clean_section = paper_code
+
+        schema_key = f"{clean_section}_{q_no}"
+        
+        schema[schema_key] = {
+            "question_no": int(q_no),
+            "section": clean_section,
+            "original_section": raw_section,
+            "question_type": q_type,
+            "key": key,
+            "marks": float(marks)
+        }
 
     print(f"Extracted {len(schema)} keys.")
     if output_path and isinstance(output_path, str):
@@ -114,6 +141,46 @@ def extract_answer_key(source, output_path=None, paper_code=None, paper_source=N
     
     return schema
 
+def _metadata_from_text(text, meta):
+    """Fills year / paper_code from page text. Returns True once nothing more can be found."""
+    if not text:
+        return False
+
+    # Year: "GATE 2025" or just "2024" if GATE missing
+    y_match = re.search(r"GATE\s?(\d{4})", text, re.IGNORECASE)
+    if y_match:
+        meta["year"] = y_match.group(1)
+    else:
+        # Fallback: look for 202x in first page
+        y_weak = re.search(r"\b(202\d)\b", text)
+        if y_weak:
+            meta["year"] = y_weak.group(1)
+
+    # Paper Code Extraction logic
+    code_match = re.search(r"Answer Key for .* \(([A-Z]{2}\d?)\)", text)
+    if not code_match:
+         code_match = re.search(r"(?:Paper )?Code\s?:\s?([A-Z]{2}\d?)", text, re.IGNORECASE)
+    if not code_match:
+         code_match = re.search(r"Subject\s?:\s?.* \(([A-Z]{2}\d?)\)", text, re.IGNORECASE)
+    if not code_match:
+         codes = "AE|AG|AR|BM|BT|CE|CH|CS|CY|DA|EC|EE|ES|EY|GE|GG|IN|MA|ME|MN|MT|NM|PE|PH|PI|ST|TF|XE|XH|XL"
+         code_match = re.search(rf"\((({codes})\d?)\)", text)
+
+    if code_match:
+        meta["paper_code"] = code_match.group(1).upper()
+
+    # Special Handling for Multi-Session Papers (CS, ME, CE, etc.)
+    session_found = False
+    if meta["paper_code"] and not meta["paper_code"][-1].isdigit():
+        session_match = re.search(r"(?:Session|Shift)\s?(\d)", text, re.IGNORECASE)
+        if session_match:
+            meta["paper_code"] += session_match.group(1)
+            session_found = True
+
+    # A code without a session digit may still get one from further down the page
+    return bool(y_match and code_match and (session_found or meta["paper_code"][-1].isdigit()))
+
+
 def detect_metadata(source, filename=""):
     """
     source: filepath (str) or file-like object
@@ -124,41 +191,21 @@ def detect_metadata(source, filename=""):
         "paper_code": ""
     }
     
+    def header_text(glyphs, bounds):
+        bottom, top = bounds
+        return pdf_text.glyphs_to_text(glyphs, top=top - (top - bottom) * HEADER_FRACTION)
+
+    def header_complete(glyphs, bounds):
+        return _metadata_from_text(header_text(glyphs, bounds), dict(meta))
+
     # 1. Try Content First (Most Reliable)
     try:
-        with pdfplumber.open(source) as pdf:
-            # Check first page text
-            text = pdf.pages[0].extract_text()
-            if text:
-                # Year: "GATE 2025" or just "2024" if GATE missing
-                y_match = re.search(r"GATE\s?(\d{4})", text, re.IGNORECASE)
-                if y_match:
-                    meta["year"] = y_match.group(1)
-                else:
-                    # Fallback: look for 202x in first page
-                    y_weak = re.search(r"\b(202\d)\b", text)
-                    if y_weak:
-                        meta["year"] = y_weak.group(1)
-
-                # Paper Code Extraction logic
-                code_match = re.search(r"Answer Key for .* \(([A-Z]{2}\d?)\)", text)
-                if not code_match:
-                     code_match = re.search(r"(?:Paper )?Code\s?:\s?([A-Z]{2}\d?)", text, re.IGNORECASE)
-                if not code_match:
-                     code_match = re.search(r"Subject\s?:\s?.* \(([A-Z]{2}\d?)\)", text, re.IGNORECASE)
-                if not code_match:
-                     codes = "AE|AG|AR|BM|BT|CE|CH|CS|CY|DA|EC|EE|ES|EY|GE|GG|IN|MA|ME|MN|MT|NM|PE|PH|PI|ST|TF|XE|XH|XL"
-                     code_match = re.search(rf"\((({codes})\d?)\)", text)
-
-                if code_match:
-                    meta["paper_code"] = code_match.group(1).upper()
-                    
-                # Special Handling for Multi-Session Papers (CS, ME, CE, etc.)
-                if meta["paper_code"] and not meta["paper_code"][-1].isdigit():
-                    session_match = re.search(r"(?:Session|Shift)\s?(\d)", text, re.IGNORECASE)
-                    if session_match:
-                        meta["paper_code"] += session_match.group(1)
-            
+        # Only page 0 is parsed, and only until its header region answers
+        # everything; otherwise the header is tried before the full page.
+        for _, _, bounds, glyphs in pdf_text.iter_pages(source, stop_when=header_complete):
+            if not _metadata_from_text(header_text(glyphs, bounds), meta):
+                _metadata_from_text(pdf_text.glyphs_to_text(glyphs), meta)
+            break
     except Exception as e:
         print(f"Error reading PDF content: {e}")
 
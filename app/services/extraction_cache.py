@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import shutil
+
+import pdfminer
+import pdfplumber
+
+from . import metrics
+from .cache_util import LRU, atomic_write
+
+# Modules whose source determines extraction output
+_EXTRACTOR_MODULES = ("extraction.py", "extraction_pool.py", "pdf_text.py")
+
+_version = None
+
+
+def extractor_version():
+    """
+    Hash of the extraction code plus the pdfplumber/pdfminer versions. Any
+    change to the extractor (or a library upgrade) yields a new version, so
+    cached results from older logic are never served.
+    """
+    global _version
+    if _version is None:
+        h = hashlib.sha256(f"pdfplumber={pdfplumber.__version__};pdfminer={pdfminer.__version__}".encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in _EXTRACTOR_MODULES:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        _version = h.hexdigest()[:16]
+    return _version
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extraction results (answer-key schemas and
+    detected metadata), keyed by sha256 of the uploaded PDF bytes and the
+    extractor version. A bounded in-memory LRU sits in front of JSON files
+    under data/extractions/<version>/; directories left by older versions are
+    removed on startup.
+    """
+    def __init__(self, base_path, max_entries=None):
+        self.version = extractor_version()
+        self.parent = os.path.join(base_path, "extractions")
+        self.root = os.path.join(self.parent, self.version)
+        self.max_entries = max_entries or int(os.getenv("EXTRACTION_CACHE_SIZE", "64"))
+        self._entries = LRU(self.max_entries)  # key -> value
+        self._prune_old_versions()
+
+    def _prune_old_versions(self):
+        try:
+            names = os.listdir(self.parent)
+        except OSError:
+            return
+        for name in names:
+            if name != self.version:
+                shutil.rmtree(os.path.join(self.parent, name), ignore_errors=True)
+
+    def key(self, kind, *parts):
+        """
+        kind: "schema" or "metadata"; parts: bytes, str or seekable binary
+        streams (hashed in chunks and rewound) that determine the extraction.
+        """
+        h = hashlib.sha256(f"{self.version}:{kind}".encode())
+        for part in parts:
+            # Each part contributes its own fixed-size digest, so bytes and a
+            # stream with the same content key alike and parts cannot run together
+            part_hash = hashlib.sha256()
+            if isinstance(part, str):
+                part_hash.update(part.encode("utf-8"))
+            elif isinstance(part, bytes):
+                part_hash.update(part)
+            elif part is not None:
+                part.seek(0)
+                for chunk in iter(lambda: part.read(1024 * 1024), b""):
+                    part_hash.update(chunk)
+                part.seek(0)
+            h.update(part_hash.digest())
+        return h.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            metrics.inc("gate_cache_requests_total", cache="extraction", result="hit")
+            return value
+
+        try:
+            with open(self._file(key), "r") as f:
+                value = json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            metrics.inc("gate_cache_requests_total", cache="extraction", result="miss")
+            return None
+        metrics.inc("gate_cache_requests_total", cache="extraction", result="disk_hit")
+        self._entries.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self._entries.put(key, value)
+
+        try:
+            with atomic_write(self._file(key)) as f:
+                json.dump({"version": self.version, "value": value}, f)
+        except OSError as e:
+            print(f"[Cache Error] Failed to persist extraction: {e}")
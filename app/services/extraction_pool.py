@@ -0,0 +1,225 @@
+import io
+import os
+import sys
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+import pdfplumber
+
+from . import metrics, profiler
+from .process_pool import ProcessPool
+
+# pdfplumber table extraction is pure-Python and runs one page at a time under
+# the GIL. With EXTRACTION_PROCESSES > 0, PDFs with at least
+# EXTRACTION_MIN_PAGES pages are split into contiguous page ranges, one per
+# worker. In-memory PDFs are placed in a shared memory block once so workers
+# read the same bytes instead of each receiving a pickled copy; path sources
+# are opened by the workers directly.
+PROCESSES = int(os.getenv("EXTRACTION_PROCESSES", "0"))
+MIN_PAGES = int(os.getenv("EXTRACTION_MIN_PAGES", "4"))
+
+COPY_CHUNK = 1024 * 1024
+
+# Per-page functions in extraction.py, by kind
+_PAGE_FUNCS = {"rows": "page_rows"}
+
+
+def _page_func(kind):
+    from . import extraction
+    return getattr(extraction, _PAGE_FUNCS[kind])
+
+
+class _SharedBuffer(io.RawIOBase):
+    """Read-only seekable file over a memoryview, without copying it."""
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            # Views must be released before the SharedMemory can close
+            self._view.release()
+        super().close()
+
+
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    # Spawned workers share the parent's resource tracker, so re-registering
+    # the name is a no-op and the parent's unlink() clears it.
+    return SharedMemory(name=name)
+
+
+def _run_pages(pdf, fn, start, stop):
+    results = []
+    for i in range(start, stop):
+        page = pdf.pages[i]
+        results.append(fn(page))
+        # Drop the page's parsed objects; only the extracted result is kept
+        page.close()
+    return results
+
+
+def _extract_range(ref, kind, start, stop):
+    """Worker: runs the page function over pages [start, stop) of one PDF."""
+    with profiler.watch("extract_pages", kind=kind, pages=f"{start}-{stop}"):
+        return _extract_pages(ref, kind, start, stop)
+
+
+def _extract_pages(ref, kind, start, stop):
+    fn = _page_func(kind)
+    source_kind, value = ref
+    if source_kind == "path":
+        with pdfplumber.open(value) as pdf:
+            return _run_pages(pdf, fn, start, stop)
+
+    name, size = value
+    shm = _attach(name)
+    try:
+        with io.BufferedReader(_SharedBuffer(shm.buf[:size])) as stream:
+            with pdfplumber.open(stream) as pdf:
+                return _run_pages(pdf, fn, start, stop)
+    finally:
+        shm.close()
+
+
+_pool = ProcessPool("extraction", PROCESSES)
+
+
+def configure(processes):
+    """Overrides EXTRACTION_PROCESSES in this process; 0 extracts every page in the calling thread (bench_extraction sweeps it)."""
+    global PROCESSES
+    PROCESSES = processes
+    _pool.configure(processes)
+
+
+def get_pool():
+    """The page-range executor for large PDFs, or None when disabled."""
+    return _pool.get()
+
+
+def _count_pages(source):
+    with metrics.span("pdf_open"):
+        pdf = pdfplumber.open(source)
+    with pdf:
+        return len(pdf.pages)
+
+
+def _share(source, size):
+    """Copies a seekable stream into a new SharedMemory block, COPY_CHUNK bytes at a time."""
+    shm = SharedMemory(create=True, size=size)
+    try:
+        pos = 0
+        while pos < size:
+            chunk = source.read(min(COPY_CHUNK, size - pos))
+            if not chunk:
+                raise OSError(f"upload buffer ended at {pos} of {size} bytes")
+            shm.buf[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    finally:
+        source.seek(0)
+    return shm
+
+
+def _map_on_pool(pool, source, kind, stage, progress):
+    shm = None
+    if isinstance(source, (str, os.PathLike)):
+        ref = ("path", os.fspath(source))
+        total = _count_pages(ref[1])
+    else:
+        size = source.seek(0, io.SEEK_END)
+        source.seek(0)
+        if not size:
+            return None
+        # Counted and copied straight from the upload's buffer: the only other
+        # copy is the shared memory block the workers read
+        total = _count_pages(source)
+        source.seek(0)
+        if total >= MIN_PAGES:
+            shm = _share(source, size)
+            ref = ("shm", (shm.name, size))
+    if total < MIN_PAGES:
+        return None
+
+    try:
+        shards = min(PROCESSES, total)
+        step = -(-total // shards)
+        futures = {
+            pool.submit(_extract_range, ref, kind, start, min(start + step, total)): start
+            for start in range(0, total, step)
+        }
+        parts = {}
+        done = 0
+        for future in as_completed(futures):
+            start = futures[future]
+            parts[start] = future.result()
+            done += len(parts[start])
+            if progress:
+                progress(stage, done, total)
+        return [result for start in sorted(parts) for result in parts[start]]
+    except BrokenProcessPool:
+        # A worker died; the next call gets a new pool and this PDF is extracted in-thread
+        _pool.reset(pool)
+        return None
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def map_pages(source, kind, stage, progress=None):
+    """
+    Runs a per-page extraction function (e.g. "rows") over every page of
+    a PDF and returns the results in page order. Uses the pool for large PDFs
+    when configured, otherwise runs in this thread.
+    source: filepath (str) or file-like object
+    progress: optional callback(stage, page, pages)
+    """
+    pool = get_pool()
+    if pool is not None:
+        results = _map_on_pool(pool, source, kind, stage, progress)
+        if results is not None:
+            return results
+
+    fn = _page_func(kind)
+    results = []
+    with metrics.span("pdf_open"):
+        pdf = pdfplumber.open(source)
+    with pdf:
+        total = len(pdf.pages)
+        for page_no, page in enumerate(pdf.pages, start=1):
+            if progress:
+                progress(stage, page_no, total)
+            results.append(fn(page))
+            page.close()
+    return results
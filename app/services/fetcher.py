@@ -0,0 +1,163 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "20"))
+TOTAL_TIMEOUT = float(os.getenv("FETCH_TOTAL_TIMEOUT", "45"))
+MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+RETRIES = int(os.getenv("FETCH_RETRIES", "2"))
+BACKOFF = float(os.getenv("FETCH_BACKOFF", "0.5"))
+PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "2"))
+HOST_WAIT = float(os.getenv("FETCH_HOST_WAIT", "5"))
+# Batch and background-job fetches have their own per-host budget (sized for
+# one batch's fan-out) on top of the interactive PER_HOST_LIMIT
+QUEUED_PER_HOST_LIMIT = int(os.getenv("FETCH_QUEUED_PER_HOST_LIMIT", os.getenv("BATCH_FANOUT", "8")))
+# Seconds a queued fetch may wait for a host slot; 0 waits indefinitely
+QUEUED_HOST_WAIT = float(os.getenv("FETCH_QUEUED_HOST_WAIT", "0"))
+POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "10"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(Exception):
+    pass
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status):
+        super().__init__(f"Upstream returned {status}")
+        self.status = status
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_host_slots = {}
+_host_lock = threading.Lock()
+
+
+def get_session():
+    """One pooled requests.Session per worker process (re-created after fork)."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+                _session, _session_pid = session, pid
+    return _session
+
+
+class _HostSlots:
+    """
+    Concurrency limits for one upstream host. Interactive and queued fetches
+    have separate budgets, so a batch can fetch QUEUED_PER_HOST_LIMIT sheets
+    at once without ever taking a slot /api/calculate needs.
+    """
+    def __init__(self, limit, queued_limit):
+        self.interactive = threading.BoundedSemaphore(limit)
+        self.queued = threading.BoundedSemaphore(queued_limit)
+
+    def acquire(self, queued=False, timeout=None):
+        return (self.queued if queued else self.interactive).acquire(timeout=timeout)
+
+    def release(self, queued=False):
+        (self.queued if queued else self.interactive).release()
+
+
+def _host_slot(host):
+    with _host_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _HostSlots(PER_HOST_LIMIT, QUEUED_PER_HOST_LIMIT)
+            _host_slots[host] = slot
+        return slot
+
+
+def _read_body(res, deadline):
+    length = res.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > MAX_BYTES and not res.headers.get("Content-Encoding"):
+        raise FetchError(f"Response too large ({length} bytes)")
+
+    # iter_content decompresses gzip/deflate incrementally, so the cap applies
+    # to the decoded size and a compressed bomb is cut off early.
+    chunks = []
+    size = 0
+    for chunk in res.iter_content(CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_BYTES:
+            raise FetchError(f"Response exceeds {MAX_BYTES} bytes")
+        if time.monotonic() > deadline:
+            raise FetchError(f"Fetch exceeded {TOTAL_TIMEOUT}s")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def fetch(url, queued=False):
+    """
+    GETs url through the shared session and returns the decoded body bytes.
+    Retries connection errors, timeouts and 429/5xx with jittered backoff.
+    Raises FetchError (or requests.HTTPError for non-retryable statuses).
+    queued: a batch or background-job fetch; it takes one of the host's
+    queued slots (waiting up to QUEUED_HOST_WAIT) instead of an interactive one.
+    """
+    host = urlsplit(url).netloc
+    slot = _host_slot(host)
+    wait = (QUEUED_HOST_WAIT or None) if queued else HOST_WAIT
+    if not slot.acquire(queued, wait):
+        metrics.inc("gate_upstream_errors_total", reason="host_busy")
+        raise FetchError(f"Too many concurrent requests to {host}, try again shortly")
+
+    try:
+        with metrics.span("fetch"):
+            return _fetch_with_retries(url)
+    finally:
+        slot.release(queued)
+
+
+def _fetch_with_retries(url):
+    session = get_session()
+    deadline = time.monotonic() + TOTAL_TIMEOUT
+    attempt = 0
+    while True:
+        try:
+            with session.get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True) as res:
+                if res.status_code in RETRY_STATUSES and attempt < RETRIES:
+                    raise _RetryableStatus(res.status_code)
+                if res.status_code >= 400:
+                    metrics.inc("gate_upstream_errors_total", reason=f"status_{res.status_code}")
+                res.raise_for_status()
+                return _read_body(res, deadline)
+        except (requests.ConnectionError, requests.Timeout, _RetryableStatus) as e:
+            metrics.inc("gate_upstream_errors_total", reason=_error_reason(e))
+            # Full jitter keeps concurrent retries from stampeding the portal
+            delay = random.uniform(0, BACKOFF * (2 ** attempt))
+            if attempt >= RETRIES or time.monotonic() + delay > deadline:
+                raise FetchError(str(e)) from e
+            print(f"[WARNING] Fetch attempt {attempt + 1} failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def _error_reason(e):
+    if isinstance(e, _RetryableStatus):
+        return f"status_{e.status}"
+    if isinstance(e, requests.Timeout):
+        return "timeout"
+    return "connection"
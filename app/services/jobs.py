@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Server is busy, please retry shortly")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    In-process job runner with named worker pools and a bounded backlog per
+    job kind, so a burst of one kind (say scoring) can't use up the room for
+    another (extraction). A job is a chain of (pool, fn) stages; each
+    fn(job_id, previous_result) runs on its pool and hands its return value to
+    the next stage, so I/O and CPU stages don't compete for the same threads.
+    No external broker needed.
+    """
+    def __init__(self, max_pending=None, ttl=None):
+        self.max_pending = max_pending or int(os.getenv("JOB_QUEUE_SIZE", "32"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("JOB_TTL", "600"))
+        self.pools = {}
+        self.workers = {}   # pool name -> thread count
+        self.limits = {}    # job kind -> max queued/running jobs (default max_pending)
+        self._jobs = {}
+        self._pending = {}  # job kind -> queued/running jobs
+        self._avg_duration = {}  # job kind -> moving average latency
+        self._lock = threading.Lock()
+
+    def add_pool(self, name, workers):
+        self.pools[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{name}")
+        self.workers[name] = workers
+
+    def set_limit(self, kind, max_pending):
+        self.limits[kind] = max_pending
+
+    @property
+    def depth(self):
+        return sum(self._pending.values())
+
+    def _retry_after(self, kind, stages):
+        # The slowest stage (fewest threads) sets the pace for this kind
+        workers = max(1, min(self.workers[pool] for pool, _ in stages))
+        avg = self._avg_duration.get(kind, 2.0)
+        return max(1, int(avg * self._pending.get(kind, 0) / workers + 0.5))
+
+    def _purge(self, now):
+        expired = [jid for jid, job in self._jobs.items()
+                   if job["finished_at"] and now - job["finished_at"] > self.ttl]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def submit(self, kind, stages, **meta):
+        """Queues a job and returns its id. Raises QueueFull when the backlog is full."""
+        stages = list(stages)
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            pending = self._pending.get(kind, 0)
+            if pending >= self.limits.get(kind, self.max_pending):
+                metrics.inc("gate_jobs_rejected_total", kind=kind)
+                raise QueueFull(self._retry_after(kind, stages))
+            self._pending[kind] = pending + 1
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "status": "queued",
+                "progress": None,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "finished_at": None,
+                **meta,
+            }
+        self._run_stage(job_id, stages, 0, None)
+        return job_id
+
+    def _run_stage(self, job_id, stages, idx, value):
+        pool, fn = stages[idx]
+        self.pools[pool].submit(self._stage, job_id, stages, idx, fn, value)
+
+    def _stage(self, job_id, stages, idx, fn, value):
+        self.update(job_id, status="running", stage=stages[idx][0])
+        try:
+            value = fn(job_id, value)
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job_id, status="failed", error=str(e))
+            return
+        if idx + 1 < len(stages):
+            self._run_stage(job_id, stages, idx + 1, value)
+        else:
+            self._finish(job_id, status="done", result=value)
+
+    def _finish(self, job_id, **fields):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            job.update(fields, finished_at=now)
+            kind = job["kind"]
+            # Moving average of job latency drives the Retry-After hint
+            avg = self._avg_duration.get(kind, 2.0)
+            self._avg_duration[kind] = 0.8 * avg + 0.2 * (now - job["created_at"])
+            self._pending[kind] -= 1
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
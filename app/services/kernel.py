@@ -0,0 +1,87 @@
+import numpy as np
+
+# Question type codes used in the compiled arrays
+OTHER, MCQ, MSQ, NAT = 0, 1, 2, 3
+TYPE_CODES = {"MCQ": MCQ, "MSQ": MSQ, "NAT": NAT}
+
+# Options are compared as bitmasks over the image suffixes a-d. Anything else
+# (stray text in a key or answer) sets a bit no valid key can have.
+OPTION_BITS = {"a": 1, "b": 2, "c": 4, "d": 8}
+UNKNOWN_BIT = 16
+
+
+def option_mask(tokens):
+    mask = 0
+    for token in tokens:
+        mask |= OPTION_BITS.get(token, UNKNOWN_BIT)
+    return mask
+
+
+class SchemaArrays:
+    """Column arrays for one schema, indexed by position in `refs`."""
+    def __init__(self, prepared):
+        self.refs = list(prepared.questions)
+        self.index = {ref: i for i, ref in enumerate(self.refs)}
+        n = len(self.refs)
+
+        self.q_type = np.zeros(n, dtype=np.int8)
+        self.marks = np.zeros(n, dtype=np.float64)
+        self.penalty = np.zeros(n, dtype=np.float64)
+        self.mta = np.zeros(n, dtype=bool)
+        self.nat_low = np.full(n, np.nan)
+        self.nat_high = np.full(n, np.nan)
+        self.key_mask = np.zeros(n, dtype=np.uint8)
+
+        for i, ref in enumerate(self.refs):
+            q = prepared.questions[ref]
+            t = TYPE_CODES.get(q["question_type"], OTHER)
+            self.q_type[i] = t
+            self.marks[i] = q["marks"]
+            self.mta[i] = q["is_mta"]
+            if t == MCQ:
+                self.key_mask[i] = option_mask([q["suffix"]])
+                # Negative marking applies to 1 and 2 mark MCQs only
+                if q["marks"] == 1:
+                    self.penalty[i] = -1/3
+                elif q["marks"] == 2:
+                    self.penalty[i] = -2/3
+            elif t == MSQ:
+                self.key_mask[i] = option_mask(q["suffixes"])
+            elif t == NAT:
+                low, high = q["range"]
+                if low is not None:
+                    self.nat_low[i] = low
+                    self.nat_high[i] = high
+
+
+def encode_answer(q_type, user_ans, option_map):
+    """
+    Encodes a candidate's answer into (mask, value) for the kernel. Option
+    labels are translated to image suffixes through option_map (labels map to
+    themselves when the sheet has no option images).
+    """
+    if q_type == NAT:
+        try:
+            return 0, float(user_ans)
+        except (TypeError, ValueError):
+            return 0, np.nan
+    if q_type == MCQ:
+        tokens = [user_ans.strip()]
+    else:
+        tokens = [x.strip() for x in user_ans.replace(";", ",").split(",") if x.strip()]
+    return option_mask(option_map.get(t, t.lower()) for t in tokens), np.nan
+
+
+def score(arrays, idx, attempted, user_mask, user_val):
+    """
+    One vectorized pass over a sheet. All inputs are aligned arrays with one
+    entry per scored question; returns (correct, marks) arrays.
+    """
+    q_type = arrays.q_type[idx]
+    is_option = (q_type == MCQ) | (q_type == MSQ)
+    with np.errstate(invalid="ignore"):
+        nat_ok = (q_type == NAT) & (arrays.nat_low[idx] <= user_val) & (user_val <= arrays.nat_high[idx] + 1e-9)
+    correct = attempted & (arrays.mta[idx] | (is_option & (user_mask == arrays.key_mask[idx])) | nat_ok)
+    wrong_penalty = np.where(q_type == MCQ, arrays.penalty[idx], 0.0)
+    marks = np.where(correct, arrays.marks[idx], np.where(attempted, wrong_penalty, 0.0))
+    return correct, marks
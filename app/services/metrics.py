@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .cache_util import atomic_write
+from .process_pool import ProcessThread
+
+# Counters, stage-latency histograms and gauges kept per process. A daemon
+# thread in each process (gunicorn worker or pool child) writes a snapshot to
+# METRICS_DIR/<pid>.json every FLUSH_INTERVAL seconds; /api/metrics sums the
+# snapshots of all live processes, so whichever worker answers the scrape
+# reports the total.
+ENABLED = os.getenv("METRICS", "true").lower() in ("1", "true", "yes")
+DIR = os.getenv("METRICS_DIR", os.path.join(os.getcwd(), "data", "metrics"))
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Seconds; the top buckets bracket the 120s gunicorn timeout
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HELP = {
+    "gate_stage_seconds": ("histogram", "Time spent per stage"),
+    "gate_stage_errors_total": ("counter", "Stages that ended in an exception"),
+    "gate_request_seconds": ("histogram", "HTTP request latency per endpoint"),
+    "gate_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "gate_upstream_errors_total": ("counter", "Failed response-sheet fetch attempts by reason"),
+    "gate_jobs_rejected_total": ("counter", "Jobs refused because the queue was full"),
+    "gate_coalesced_total": ("counter", "Calls that waited on an identical in-flight call instead of repeating it"),
+    "gate_job_queue_depth": ("gauge", "Queued and running background jobs"),
+    "gate_processes": ("gauge", "Processes contributing to these metrics"),
+}
+
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+_gauges = {}      # name -> fn() returning the current value
+_lock = threading.Lock()
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+    _flusher.ensure()
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+    _flusher.ensure()
+
+
+@contextmanager
+def span(stage):
+    """Times a block into gate_stage_seconds{stage}; exceptions also count as stage errors."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        inc("gate_stage_errors_total", stage=stage)
+        raise
+    finally:
+        observe("gate_stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+def gauge(name, fn):
+    """Registers fn() as the value of a gauge, read at every snapshot."""
+    _gauges[name] = fn
+    if ENABLED:
+        _flusher.ensure()
+
+
+def snapshot():
+    gauges = {}
+    for name, fn in list(_gauges.items()):
+        try:
+            gauges[name] = float(fn())
+        except Exception:
+            pass
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "written_at": time.time(),
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, list(labels), list(hist)] for (name, labels), hist in _histograms.items()],
+            "gauges": gauges,
+        }
+
+
+def flush():
+    """Writes this process's snapshot for the other workers to read."""
+    path = os.path.join(DIR, f"{os.getpid()}.json")
+    try:
+        with atomic_write(path) as f:
+            json.dump(snapshot(), f)
+    except OSError as e:
+        print(f"[Metrics Error] Failed to write {path}: {e}")
+
+
+def _flush_loop():
+    while True:
+        flush()
+        time.sleep(FLUSH_INTERVAL)
+
+
+# Started by the first metric recorded in each process (again after a fork)
+_flusher = ProcessThread("metrics-flush", _flush_loop)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Snapshots of every live process; files left by exited processes are removed."""
+    flush()
+    snapshots = []
+    try:
+        names = os.listdir(DIR)
+    except OSError:
+        return [snapshot()]
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(DIR, name)
+        try:
+            pid = int(name[:-len(".json")])
+        except ValueError:
+            continue
+        if not _alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All live processes' metrics, summed, in the Prometheus text format."""
+    snapshots = collect()
+    counters, histograms, gauges = {}, {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            total = histograms.setdefault(key, [0] * len(hist))
+            for i, v in enumerate(hist):
+                total[i] += v
+        for name, value in snap["gauges"].items():
+            gauges[name] = gauges.get(name, 0.0) + value
+    gauges["gate_processes"] = float(len(snapshots))
+
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described and name in HELP:
+            kind, text = HELP[name]
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+        described.add(name)
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name)
+        lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+    for (name, labels), hist in sorted(histograms.items()):
+        describe(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), hist[:-1]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_number(hist[-1])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    for name, value in sorted(gauges.items()):
+        describe(name)
+        lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
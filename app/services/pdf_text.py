@@ -0,0 +1,117 @@
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+
+from . import metrics
+
+# Lightweight text path for regex lookups (year, paper code, "Carry ONE mark"
+# headers). pdfplumber builds a dict with ~20 attributes per character and
+# extract_text() then clusters words; here pdfminer's interpreter hands each
+# glyph to a device that keeps only (y, x0, x1, height, text), and lines are
+# assembled with pdfplumber's default 3pt tolerances. Pages are read lazily,
+# so callers can stop after the page that answers their question.
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+class _StopPage(Exception):
+    pass
+
+
+class _GlyphCollector(PDFTextDevice):
+    def __init__(self, rsrcmgr, stop_when=None):
+        super().__init__(rsrcmgr)
+        self.stop_when = stop_when
+        self.bounds = None
+        self.glyphs = []
+        self._next_check = 64
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+        adv = font.char_width(cid) * fontsize * scaling
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            return adv
+        a, b, c, d, e, f = matrix
+        self.glyphs.append((f + rise * d, e, e + adv * a, fontsize * abs(d), text))
+        # Check at doubling glyph counts so the checks stay O(n log n)
+        if self.stop_when and len(self.glyphs) >= self._next_check:
+            self._next_check *= 2
+            if self.stop_when(self.glyphs, self.bounds):
+                raise _StopPage()
+        return adv
+
+    def reset(self, bounds):
+        self.bounds = bounds
+        self.glyphs = []
+        self._next_check = 64
+
+
+def glyphs_to_text(glyphs, top=None):
+    """
+    Joins glyphs into lines, top of the page first. top: optional y (PDF
+    coordinates, origin bottom-left) below which glyphs are ignored.
+    """
+    if top is not None:
+        glyphs = [g for g in glyphs if g[0] >= top]
+    lines = []
+    for glyph in sorted(glyphs, key=lambda g: -g[0]):
+        if lines and abs(lines[-1][0] - glyph[0]) <= Y_TOLERANCE:
+            lines[-1][1].append(glyph)
+        else:
+            lines.append((glyph[0], [glyph]))
+
+    out = []
+    for _, line in lines:
+        parts = []
+        prev_x1 = None
+        for _, x0, x1, _, text in sorted(line, key=lambda g: g[1]):
+            if prev_x1 is not None and x0 - prev_x1 > X_TOLERANCE and parts[-1] != " " and text != " ":
+                parts.append(" ")
+            parts.append(text)
+            prev_x1 = x1
+        out.append("".join(parts))
+    return "\n".join(out)
+
+
+def iter_pages(source, stop_when=None):
+    """
+    Yields (page_no, pages, (bottom, top), glyphs) for each page in order,
+    parsing a page only when the consumer asks for it.
+    source: filepath (str) or file-like object
+    stop_when: optional callback(glyphs, (bottom, top)); once it returns True
+    the rest of that page's content stream is skipped
+    """
+    fp = open(source, "rb") if isinstance(source, str) else source
+    try:
+        if hasattr(fp, "seek"):
+            fp.seek(0)
+        with metrics.span("pdf_open"):
+            doc = PDFDocument(PDFParser(fp))
+            total = resolve1(resolve1(doc.catalog["Pages"])["Count"])
+        rsrcmgr = PDFResourceManager()
+        device = _GlyphCollector(rsrcmgr, stop_when)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page_no, page in enumerate(PDFPage.create_pages(doc), start=1):
+            x0, y0, x1, y1 = page.mediabox
+            device.reset((y0, y1))
+            try:
+                interpreter.process_page(page)
+            except _StopPage:
+                pass
+            yield page_no, total, (y0, y1), device.glyphs
+    finally:
+        if fp is not source:
+            fp.close()
+        elif hasattr(fp, "seek"):
+            fp.seek(0)
+
+
+def page_texts(source):
+    """Yields (page_no, pages, text) for each page, lazily."""
+    for page_no, total, _, glyphs in iter_pages(source):
+        yield page_no, total, glyphs_to_text(glyphs)
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ProcessPool:
+    """
+    A lazily started ProcessPoolExecutor per serving process. It is created
+    on first use (so after gunicorn forks) with the spawn start method: the
+    parent has live threads and sockets that fork would copy. When a worker
+    dies the executor is broken for good, so callers that see
+    BrokenProcessPool call reset() and the next get() starts a fresh one.
+    """
+    def __init__(self, name, processes, initializer=None, initargs=()):
+        self.name = name
+        self.processes = processes
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, processes):
+        """Shuts the running executor down (waiting for its tasks); the next get() starts one with `processes` workers."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+            self.processes = processes
+
+    def get(self):
+        """The executor for this process, or None when the pool is disabled."""
+        if self.processes <= 0:
+            return None
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            with self._lock:
+                if self._pool is None or self._pid != pid:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=self.initializer,
+                        initargs=self.initargs,
+                    )
+                    self._pid = pid
+        return self._pool
+
+    def reset(self, broken):
+        """Discards `broken` (the executor a call failed on) unless it was already replaced."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = None
+        print(f"[WARNING] {self.name} process pool broke (a worker died); starting a new one")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+class ProcessThread:
+    """
+    A daemon thread that should run once in every serving process. Threads do
+    not survive a fork, so ensure() starts it on first use in each process,
+    including gunicorn workers forked after the parent already started one.
+    """
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(target=self.target, name=self.name, daemon=True).start()
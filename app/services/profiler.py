@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from .process_pool import ProcessThread
+
+# Stack sampling for slow work. Requests and jobs register their thread on
+# start (a dict insert); a sampler thread sleeps until the oldest of them has
+# run for THRESHOLD seconds and only then reads its stack through
+# sys._current_frames() every INTERVAL. Work that finishes under the threshold
+# is never sampled. Profiles of slow work are written to DIR as collapsed
+# stacks (flamegraph.pl / speedscope) plus a JSON file with the request
+# parameters. THRESHOLD=0 turns the profiler off.
+THRESHOLD = float(os.getenv("PROFILE_THRESHOLD", "0"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "data", "profiles"))
+MAX_PROFILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+_active = {}  # id -> _Profile
+_cond = threading.Condition()
+
+
+class _Profile:
+    def __init__(self, label, params):
+        self.label = label
+        self.params = dict(params or {})
+        self.thread_id = threading.get_ident()
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.samples = Counter()  # collapsed stack -> count
+
+
+def start(label, params=None):
+    """Registers the calling thread for sampling; returns a handle for stop(), or None when off."""
+    if THRESHOLD <= 0:
+        return None
+    _sampler.ensure()
+    profile = _Profile(label, params)
+    with _cond:
+        _active[id(profile)] = profile
+        _cond.notify()
+    return profile
+
+
+def stop(profile, params=None):
+    """Unregisters; writes the profile if the work ran long enough to be sampled."""
+    if profile is None:
+        return None
+    with _cond:
+        _active.pop(id(profile), None)
+        # The sampler adds to samples under _cond; once unregistered it stops
+        samples = Counter(profile.samples)
+    if not samples:
+        return None
+    if params:
+        profile.params.update(params)
+    return _write(profile, samples, time.monotonic() - profile.started)
+
+
+@contextmanager
+def watch(label, **params):
+    profile = start(label, params)
+    try:
+        yield
+    finally:
+        stop(profile)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sample_loop():
+    while True:
+        with _cond:
+            now = time.monotonic()
+            due = [p for p in _active.values() if now - p.started >= THRESHOLD]
+            if not due:
+                next_due = min((p.started + THRESHOLD for p in _active.values()), default=None)
+                _cond.wait(None if next_due is None else next_due - now)
+                continue
+        frames = sys._current_frames()
+        stacks = [(p, _collapse(frames[p.thread_id])) for p in due if p.thread_id in frames]
+        del frames
+        with _cond:
+            for profile, stack in stacks:
+                if id(profile) in _active:
+                    profile.samples[stack] += 1
+        del stacks
+        time.sleep(INTERVAL)
+
+
+_sampler = ProcessThread("profile-sampler", _sample_loop)
+
+
+def _write(profile, samples, duration):
+    stamp = datetime.fromtimestamp(profile.started_at).strftime("%Y%m%d-%H%M%S")
+    name = f"{stamp}-{profile.label}-{int(duration * 1000)}ms-{os.getpid()}-{id(profile) & 0xffff:04x}"
+    base = os.path.join(DIR, name)
+    try:
+        os.makedirs(DIR, exist_ok=True)
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".json", "w") as f:
+            json.dump({
+                "label": profile.label,
+                "params": profile.params,
+                "started_at": profile.started_at,
+                "duration_s": duration,
+                "threshold_s": THRESHOLD,
+                "interval_s": INTERVAL,
+                "samples": sum(samples.values()),
+                "stacks": name + ".collapsed",
+            }, f, indent=2, default=str)
+    except OSError as e:
+        print(f"[Profile Error] Failed to write {base}: {e}")
+        return None
+    print(f"[DEBUG] Slow {profile.label} ({duration:.1f}s): profile saved to {base}.collapsed")
+    _prune()
+    return base + ".collapsed"
+
+
+def _prune():
+    try:
+        names = sorted(n for n in os.listdir(DIR) if n.endswith(".collapsed"))
+    except OSError:
+        return
+    for name in names[:max(len(names) - MAX_PROFILES, 0)]:
+        for path in (name, name[:-len(".collapsed")] + ".json"):
+            try:
+                os.remove(os.path.join(DIR, path))
+            except OSError:
+                pass
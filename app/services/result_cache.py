@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from . import metrics
+from .cache_util import LRU, atomic_write
+
+
+class ResultCache:
+    """
+    Two-tier cache of score reports keyed by sha256(schema version + URL).
+    A bounded in-memory LRU sits in front of JSON files under data/results/,
+    grouped per paper so invalidate(year, code) can drop them in one go. Files
+    past the TTL are deleted by prune(), which put() runs every prune_interval.
+    """
+    def __init__(self, base_path, max_entries=None, ttl=None, prune_interval=None):
+        self.root = os.path.join(base_path, "results")
+        self.max_entries = max_entries or int(os.getenv("RESULT_CACHE_SIZE", "512"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESULT_CACHE_TTL", "86400"))
+        self.prune_interval = prune_interval if prune_interval is not None else \
+            float(os.getenv("RESULT_CACHE_PRUNE_INTERVAL", "3600"))
+        self._pruned_at = 0.0
+        self._entries = LRU(self.max_entries)  # key -> (stored_at, (year, code), report)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url, schema):
+        return hashlib.sha256(f"{schema.version}:{url}".encode("utf-8")).hexdigest()
+
+    def _file(self, year, code, key):
+        return os.path.join(self.root, str(year), str(code), f"{key}.json")
+
+    def get(self, url, schema):
+        key = self._key(url, schema)
+        now = time.time()
+        hit = self._entries.get(key)
+        if hit and now - hit[0] < self.ttl:
+            metrics.inc("gate_cache_requests_total", cache="result", result="hit")
+            return hit[2]
+
+        path = self._file(schema.year, schema.code, key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or now - entry.get("stored_at", 0) >= self.ttl:
+            metrics.inc("gate_cache_requests_total", cache="result", result="miss")
+            return None
+        metrics.inc("gate_cache_requests_total", cache="result", result="disk_hit")
+        self._entries.put(key, (entry["stored_at"], (schema.year, schema.code), entry["report"]))
+        return entry["report"]
+
+    def put(self, url, schema, report):
+        key = self._key(url, schema)
+        stored_at = time.time()
+        self._entries.put(key, (stored_at, (schema.year, schema.code), report))
+
+        try:
+            with atomic_write(self._file(schema.year, schema.code, key)) as f:
+                json.dump({"stored_at": stored_at, "url": url, "report": report}, f)
+        except OSError as e:
+            print(f"[Cache Error] Failed to persist result: {e}")
+
+        with self._lock:
+            due = stored_at - self._pruned_at >= self.prune_interval
+            if due:
+                self._pruned_at = stored_at
+        if due:
+            self.prune(stored_at)
+
+    def prune(self, now=None):
+        """Deletes result files older than the TTL (and empty paper folders); returns how many."""
+        now = now or time.time()
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root, topdown=False):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    # Files are written once, so mtime is their stored_at
+                    if now - os.path.getmtime(path) >= self.ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+            if dirpath != self.root:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+        if removed:
+            print(f"[DEBUG] Pruned {removed} expired result files")
+        return removed
+
+    def invalidate(self, year, code):
+        paper = (str(year), str(code))
+        self._entries.discard_if(lambda entry: entry[1] == paper)
+        shutil.rmtree(os.path.join(self.root, *paper), ignore_errors=True)
@@ -0,0 +1,214 @@
+import hashlib
+import mmap
+import struct
+
+from .scoring import schema_version
+
+# schema.bin: a columnar, struct-packed copy of schema.json written next to it.
+# Layout (little endian):
+#   header    magic, format, reserved, questions, schema_version, source,
+#             strings, blob bytes
+#   offsets   uint32 x (strings + 1)   character offsets into the decoded blob
+#   blob      utf-8                    every distinct string, concatenated
+#   marks     float64 x questions
+#   numbers   int32 x questions        question_no
+#   fields    uint32 x questions x 5   string ids of ref, section,
+#                                      original_section, question_type, key
+# schema.json stays the source of truth: "source" is a hash of the etag of the
+# schema.json the binary was built from, and load() ignores (and rebuilds) a
+# schema.bin whose source no longer matches. Schemas that do not fit this
+# layout (extra fields, non-float marks) simply get no schema.bin.
+MAGIC = b"GSCH"
+FORMAT = 2
+HEADER = struct.Struct("<4sHHI16s16sII")
+NONE = 0xFFFFFFFF
+
+FIELDS = ("section", "original_section", "question_type", "key")
+
+
+def source_id(etag):
+    """16-byte tag of a schema.json etag, as stored in the header."""
+    return hashlib.sha256(str(etag).encode("utf-8")).digest()[:16]
+
+
+def encode(schema, version=None, etag=None):
+    """
+    Packs a schema dict built from the schema.json with this etag; raises
+    ValueError if it does not fit the layout.
+    """
+    strings = {}
+
+    def string_id(value):
+        if value is None:
+            return NONE
+        if not isinstance(value, str):
+            raise ValueError(f"expected a string, got {value!r}")
+        return strings.setdefault(value, len(strings))
+
+    marks, numbers, fields = [], [], []
+    for ref, q in schema.items():
+        if not isinstance(q, dict) or set(q) != {"question_no", "marks", *FIELDS}:
+            raise ValueError(f"{ref}: unexpected fields")
+        if type(q["question_no"]) is not int or type(q["marks"]) is not float:
+            raise ValueError(f"{ref}: question_no must be int and marks float")
+        if ref is None or any(q[f] is None for f in FIELDS[:-1]):
+            raise ValueError(f"{ref}: only the key may be null")
+        marks.append(q["marks"])
+        numbers.append(q["question_no"])
+        fields.append(string_id(ref))
+        fields.extend(string_id(q[f]) for f in FIELDS)
+
+    offsets = [0]
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+    blob = "".join(strings).encode("utf-8")
+    n = len(schema)
+    version = (version or schema_version(schema)).encode("ascii")
+    return b"".join((
+        HEADER.pack(MAGIC, FORMAT, 0, n, version, source_id(etag), len(strings), len(blob)),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        blob,
+        struct.pack(f"<{n}d", *marks),
+        struct.pack(f"<{n}i", *numbers),
+        struct.pack(f"<{n * 5}I", *fields),
+    ))
+
+
+def _header(buf):
+    try:
+        header = HEADER.unpack_from(buf, 0)
+    except struct.error as e:
+        raise ValueError(f"truncated schema.bin: {e}")
+    if header[0] != MAGIC or header[1] != FORMAT:
+        raise ValueError("not a schema.bin (or an older format version)")
+    return header
+
+
+def source(buf):
+    """The source tag of a schema.bin (compare with source_id(etag))."""
+    return _header(buf)[5]
+
+
+def decode(buf):
+    """Returns (schema, version) from bytes or an mmap; raises ValueError if buf is not schema.bin."""
+    _, _, _, n, version, _, n_strings, blob_len = _header(buf)
+    try:
+        pos = HEADER.size
+        offsets = struct.unpack_from(f"<{n_strings + 1}I", buf, pos)
+        pos += 4 * (n_strings + 1)
+        text = bytes(buf[pos:pos + blob_len]).decode("utf-8")
+        pos += blob_len
+        marks = struct.unpack_from(f"<{n}d", buf, pos)
+        pos += 8 * n
+        numbers = struct.unpack_from(f"<{n}i", buf, pos)
+        pos += 4 * n
+        fields = struct.unpack_from(f"<{n * 5}I", buf, pos)
+    except struct.error as e:
+        raise ValueError(f"truncated schema.bin: {e}")
+
+    strings = [text[offsets[i]:offsets[i + 1]] for i in range(n_strings)]
+    strings.append(None)  # NONE maps past the end
+    none_id = len(strings) - 1
+
+    def s(i):
+        return strings[none_id if i == NONE else i]
+
+    schema = {}
+    for i in range(n):
+        ref, section, original, q_type, key = fields[5 * i:5 * i + 5]
+        schema[s(ref)] = {
+            "question_no": numbers[i],
+            "section": s(section),
+            "original_section": s(original),
+            "question_type": s(q_type),
+            "key": s(key),
+            "marks": marks[i],
+        }
+    return schema, version.decode("ascii")
+
+
+def save(storage, base_dir, schema):
+    """
+    Writes schema.json and then schema.bin, tagged with the etag schema.json
+    got. If the binary copy cannot be written, load() falls back to JSON.
+    """
+    json_path = f"{base_dir}/schema.json"
+    storage.save_json(json_path, schema)
+    stat = storage.stat(json_path)
+    _write(storage, base_dir, schema, schema_version(schema), stat and stat["etag"], replace=True)
+
+
+def _write(storage, base_dir, schema, version, etag, replace=False):
+    """Best effort: a paper without a usable schema.bin loads from JSON."""
+    path = f"{base_dir}/schema.bin"
+    try:
+        if etag is None:
+            raise ValueError("schema.json has no etag to check a binary copy against")
+        packed = encode(schema, version, etag)
+    except ValueError as e:
+        print(f"[Storage] No schema.bin for {base_dir}: {e}")
+        if replace:
+            storage.delete(path)
+        return
+    try:
+        storage.save(path, packed, "application/octet-stream")
+    except Exception as e:
+        print(f"[Storage Error] Could not write {path}: {e}")
+
+
+def _read_current(storage, path, tag):
+    """Decoded schema.bin if its source tag matches, else None. The bin is mmapped when local."""
+    local = storage.local_path(path)
+    if local is not None:
+        with open(local, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return decode(mm) if source(mm) == tag else None
+    if storage.mode != "local":
+        data = storage.read(path)
+        if data and source(data) == tag:
+            return decode(data)
+    return None
+
+
+def load(storage, base_dir, etag=None):
+    """
+    Returns (schema, version) for a paper folder, or (None, None). Reads
+    schema.bin (memory-mapped when storage has it as a local file) if it was
+    built from the current schema.json, whose etag callers that already
+    stat()ed it can pass. Otherwise reads schema.json and rebuilds schema.bin.
+    """
+    json_path = f"{base_dir}/schema.json"
+    if etag is None:
+        stat = storage.stat(json_path)
+        if stat is None:
+            return None, None
+        etag = stat["etag"]
+
+    path = f"{base_dir}/schema.bin"
+    if etag is not None:
+        try:
+            current = _read_current(storage, path, source_id(etag))
+            if current is not None:
+                return current
+        except (OSError, ValueError) as e:
+            print(f"[Storage Error] Ignoring {path}: {e}")
+
+    schema = storage.read_json(json_path)
+    if not schema:
+        return None, None
+    version = schema_version(schema)
+    if etag is not None:
+        print(f"[Storage] Rebuilding {path} from schema.json")
+        _write(storage, base_dir, schema, version, etag)
+    return schema, version
+
+
+def backfill(storage, base_dir):
+    """
+    Makes sure a paper's schema.bin matches its schema.json (approving an
+    older upload, or a copy that changed the etag). Best effort: on failure
+    the paper keeps loading from JSON.
+    """
+    try:
+        load(storage, base_dir)
+    except Exception as e:
+        print(f"[Storage Error] Could not refresh {base_dir}/schema.bin: {e}")
@@ -0,0 +1,74 @@
+import os
+import time
+
+from . import metrics, schema_bin
+from .cache_util import LRU
+from .scoring import PreparedSchema
+from .singleflight import SingleFlight
+
+
+class SchemaCache:
+    """
+    Per-worker LRU cache of live schemas, keyed by (year, code).
+    Entries hold the PreparedSchema so a warm /api/calculate does no storage
+    I/O and no per-request schema setup. After the TTL an entry is revalidated
+    with a storage stat() and only re-read if the etag changed. Concurrent
+    misses for one paper share a single stat and load.
+    """
+    def __init__(self, storage, max_entries=None, ttl=None):
+        self.storage = storage
+        self.max_entries = max_entries or int(os.getenv("SCHEMA_CACHE_SIZE", "64"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+        self._entries = LRU(self.max_entries)  # (year, code) -> (checked_at, etag, PreparedSchema)
+        self._loads = SingleFlight("schema_load")
+
+    @staticmethod
+    def _key(year, code):
+        return (str(year), str(code))
+
+    @staticmethod
+    def _path(year, code):
+        return f"live/{year}/{code}/schema.json"
+
+    def get(self, year, code):
+        """Returns the PreparedSchema for a live paper, or None if it does not exist."""
+        key = self._key(year, code)
+        now = time.monotonic()
+        hit = self._entries.get(key)
+        if hit and now - hit[0] < self.ttl:
+            metrics.inc("gate_cache_requests_total", cache="schema", result="hit")
+            return hit[2]
+        return self._loads.do(key, lambda: self._refresh(key, hit, now))
+
+    def _refresh(self, key, hit, now):
+        # Stat before reading: if the file changes in between, the stored etag
+        # is the older one and the next revalidation re-reads it
+        stat = self.storage.stat(self._path(*key))
+        if stat is None:
+            self.invalidate(*key)
+            metrics.inc("gate_cache_requests_total", cache="schema", result="miss")
+            return None
+        etag = stat.get("etag")
+        if hit and etag is not None and etag == hit[1]:
+            metrics.inc("gate_cache_requests_total", cache="schema", result="revalidated")
+            prepared = hit[2]
+        else:
+            metrics.inc("gate_cache_requests_total", cache="schema", result="miss")
+            prepared = self._load(*key, etag)
+            if prepared is None:
+                return None
+
+        self._entries.put(key, (now, etag, prepared))
+        return prepared
+
+    def _load(self, year, code, etag=None):
+        schema, version = schema_bin.load(self.storage, f"live/{year}/{code}", etag)
+        if not schema:
+            return None
+        return PreparedSchema(schema, year=year, code=code, version=version)
+
+    def invalidate(self, year, code):
+        self._entries.pop(self._key(year, code))
+
+    def clear(self):
+        self._entries.clear()
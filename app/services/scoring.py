@@ -1,7 +1,9 @@
+import hashlib
 import json
 import re
-from bs4 import BeautifulSoup
-import requests
+import time
+import numpy as np
+from . import fetcher, kernel, metrics, sheet_parser
 
 def parse_range(key_range):
     """Parses NAT range string like '24 to 24' or '0.25 to 0.28'."""
@@ -13,248 +15,252 @@ def parse_range(key_range):
     except ValueError:
         return None, None
 
-def calculate_score(html_path, schema_data_or_path):
+def split_options(key):
+    """Splits an MSQ key/answer like 'A;C' or 'A, C' into its option tokens."""
+    return [x.strip() for x in key.replace(";", ",").split(",") if x.strip()]
+
+def schema_version(schema):
+    """Content hash of a schema; changes whenever the paper's schema.json changes."""
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+_OPTION_LABEL = re.compile(r"([A-D])\.|\(([A-D])\)")
+_OPTION_SUFFIXES = frozenset("abcd")
+
+class PreparedSchema:
+    """
+    A schema with all per-question setup done once: the image-name regex compiled,
+    NAT ranges parsed and MSQ option sets split. Built by the schema cache so
+    repeated scoring against the same paper skips this work.
+    """
+    def __init__(self, schema, year=None, code=None, version=None):
+        self.schema = schema
+        self.year = year
+        self.code = code
+        # version: schema_version(schema), when already known (schema.bin stores it)
+        self.version = version or schema_version(schema)
+
+        # Extract active subjects from schema keys (e.g., "GA_1" -> "GA")
+        active_subjects = set()
+        for k in schema.keys():
+            if "_" in k:
+                active_subjects.add(k.split("_")[0])
+
+        # One alternation over every subject, so an image name is searched
+        # once rather than once per subject (XE/XL papers have up to 8
+        # sections). Each subject's question number is a named group; longer
+        # codes come first so "XEA" beats "XE" at the same position.
+        self.image_subjects = {}
+        alternatives = []
+        for i, subj in enumerate(sorted(active_subjects, key=lambda s: (-len(s), s))):
+            self.image_subjects[f"s{i}"] = subj
+            alternatives.append(rf"{re.escape(subj.lower())}[a-z0-9]*q(?P<s{i}>\d+)")
+        self.image_regex = re.compile(f"_(?:{'|'.join(alternatives)})" if alternatives else "(?!)")
+
+        self.questions = {}
+        for ref, q_data in schema.items():
+            official_key = q_data["key"] or ""
+            q_type = q_data["question_type"]
+            entry = {
+                "key": official_key,
+                "question_type": q_type,
+                "marks": q_data["marks"],
+                "is_mta": "MTA" in official_key.upper(),
+            }
+            if q_type == "MCQ":
+                entry["suffix"] = official_key.lower().strip()
+            elif q_type == "MSQ":
+                options = split_options(official_key)
+                entry["suffixes"] = [x.lower() for x in options]
+                entry["display_key"] = ";".join(sorted(options))
+            elif q_type == "NAT":
+                entry["range"] = parse_range(official_key)
+            self.questions[ref] = entry
+
+        # Column form of the schema for the vectorized scoring kernel
+        self.arrays = kernel.SchemaArrays(self)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def resolve(self, images):
+        """
+        (question ref, option map) from one question's images in a single pass.
+        Option images (their <td> text starts "A." or "(A)") map the label the
+        candidate saw to the image suffix; the first other image whose name
+        matches a subject pattern gives the question, e.g. "..._csq12" -> "CS_12".
+        """
+        ref = None
+        option_map = {}
+        for final_name, txt in images:
+            if txt is not None:
+                label = _OPTION_LABEL.match(txt)
+                if label:
+                    suffix = final_name.rsplit('.', 1)[0][-1:].lower()
+                    if suffix in _OPTION_SUFFIXES:
+                        option_map[label[label.lastindex]] = suffix
+                    continue
+            if ref is None:
+                match = self.image_regex.search(final_name.lower())
+                if match:
+                    group = match.lastgroup
+                    ref = f"{self.image_subjects[group]}_{int(match[group])}"
+        return ref, option_map
+
+def prepare_schema(schema_data_or_path, year=None, code=None):
+    if isinstance(schema_data_or_path, PreparedSchema):
+        return schema_data_or_path
     if isinstance(schema_data_or_path, str):
         with open(schema_data_or_path, "r") as f:
             schema = json.load(f)
     else:
         schema = schema_data_or_path
+    return PreparedSchema(schema, year=year, code=code)
+
+def load_sheet(html_path, queued=False):
+    """
+    Returns the raw response-sheet bytes from a URL or a local file path.
+    queued: batch/background fetch, which yields host slots to interactive ones.
+    """
+    if html_path.startswith("http"):
+        print(f"[DEBUG] Fetching URL: {html_path}")
+        return fetcher.fetch(html_path, queued)
+    with open(html_path, "rb") as f:
+        return f.read()
 
-    # Extract active subjects from schema keys (e.g., "GA_1" -> "GA")
-    active_subjects = set()
-    for k in schema.keys():
-        if "_" in k:
-            active_subjects.add(k.split("_")[0])
-    
-    # Pre-compile regexes for efficiency
-    subject_regexes = {}
-    for subj in active_subjects:
-        pattern = rf"_{re.escape(subj.lower())}[a-z0-9]*q(\d+)"
-        subject_regexes[subj] = re.compile(pattern)
+def calculate_score(html_path, schema_data_or_path):
+    prepared = prepare_schema(schema_data_or_path)
 
     # Read HTML content
-    if html_path.startswith("http"):
-        try:
-             headers = {
-                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-             }
-             print(f"[DEBUG] Fetching URL: {html_path}")
-             r = requests.get(html_path, headers=headers)
-             r.raise_for_status()
-             soup = BeautifulSoup(r.text, "html.parser")
-        except Exception as e:
-             print(f"[ERROR] Failed to fetch URL: {e}")
-             return {"error": str(e)}
-    else:
-        with open(html_path, "r", encoding="utf-8") as f:
-            soup = BeautifulSoup(f, "html.parser")
+    try:
+        html = load_sheet(html_path)
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch URL: {e}")
+        return {"error": str(e)}
+
+    return score_html(html, prepared)
+
+def display_key(q_data, option_map):
+    """The official key expressed in this candidate's (shuffled) option labels."""
+    official_key = q_data["key"]
+    q_type = q_data["question_type"]
+
+    if q_type == "MCQ":
+        target_suffix = q_data["suffix"]
+        for u_opt, suffix in option_map.items():
+            if suffix == target_suffix:
+                return u_opt
+
+    elif q_type == "MSQ":
+        mapped_labels = []
+        for suff in q_data["suffixes"]:
+            for u_opt, map_suff in option_map.items():
+                if map_suff == suff:
+                    mapped_labels.append(u_opt)
+        if mapped_labels:
+            return ";".join(sorted(mapped_labels))
+        return q_data["display_key"]
 
-    questions = soup.find_all("table", class_="questionPnlTbl")
+    return official_key
+
+def score_html(html, schema_data_or_path, details=True):
+    """
+    Scores an already loaded response sheet (str or bytes) against a schema.
+    details=False returns only the summary and skips building the
+    per-question detail dicts.
+    """
+    prepared = prepare_schema(schema_data_or_path)
+    summary, rows = _score(html, prepared, details)
+    report = {"summary": summary}
+    if details:
+        report["details"] = list(rows)
+    return report
+
+def score_html_iter(html, schema_data_or_path):
+    """
+    Like score_html, but returns (summary, details) where details is a
+    generator building each detail dict only when it is consumed, so a
+    streamed report never holds the whole list.
+    """
+    return _score(html, prepare_schema(schema_data_or_path), True)
+
+def _score(html, prepared, details):
+    arrays = prepared.arrays
+
+    questions = sheet_parser.parse_questions(html)
     print(f"[DEBUG] Found {len(questions)} question tables.")
-    
-    total_score = 0
-    attempted = 0
-    correct = 0
-    wrong = 0
-    details = []
-
-    for i, q_tbl in enumerate(questions):
-        # 1. Extract Question ID and Status
-        status = "Not Attempted"
-        user_ans = None
-        
-        menu_tbl = q_tbl.find_next("table", class_="menu-tbl")
-        if menu_tbl:
-            cols = menu_tbl.find_all("td")
-            for k in range(0, len(cols), 2):
-                if k+1 >= len(cols): break
-                label = cols[k].text.strip()
-                val = cols[k+1].text.strip()
-                
-                if "Question ID" in label:
-                    pass
-                elif "Status" in label:
-                    status = val
-                elif "Chosen Option" in label:
-                    user_ans = val
-                elif "Given Answer" in label:
-                    user_ans = val
-
-        # Fallback for NAT Answer
-        if user_ans is None:
-            q_row_tbl = q_tbl.find("table", class_="questionRowTbl")
-            if q_row_tbl:
-                tds = q_row_tbl.find_all("td")
-                for k in range(len(tds)-1):
-                    txt = tds[k].text.strip()
-                    if "Given Answer" in txt and ":" in txt:
-                        user_ans = tds[k+1].text.strip()
-                        break
+    started = time.perf_counter()
+
+    # 1. Walk the sheet once, resolving each question and encoding its answer
+    rows = []
+    idx = []
+    answered = []
+    user_masks = []
+    user_vals = []
+
+    for record in questions:
+        status = record["status"]
+        user_ans = record["user_ans"]
         
         if user_ans == "--" or not user_ans:
             user_ans = None
 
-        # 2. Extract Master Question Number AND Option Mapping
-        master_q_ref = None 
-        option_map = {} 
-        
-        imgs = q_tbl.find_all("img")
-        for img in imgs:
-            src = img.get("src", "")
-            name = img.get("name", "")
-            final_name = name if name else src.split("/")[-1]
-            check_str = final_name.lower()
-            
-            # Check for Option Images first
-            parent_td = img.find_parent("td")
-            if parent_td:
-                txt = parent_td.get_text(strip=True)
-                opt_label = None
-                if txt.startswith("A.") or txt.startswith("(A)"): opt_label = "A"
-                elif txt.startswith("B.") or txt.startswith("(B)"): opt_label = "B"
-                elif txt.startswith("C.") or txt.startswith("(C)"): opt_label = "C"
-                elif txt.startswith("D.") or txt.startswith("(D)"): opt_label = "D"
-                
-                if opt_label:
-                    base = final_name.rsplit('.', 1)[0]
-                    suffix = base[-1].lower()
-                    if suffix in ['a','b','c','d']:
-                        option_map[opt_label] = suffix
-                    continue
-
-            # Check for Question ID Pattern
-            if not master_q_ref:
-                for subj, regex in subject_regexes.items():
-                    match = regex.search(check_str)
-                    if match:
-                        q_num = int(match.group(1))
-                        master_q_ref = f"{subj}_{q_num}"
-                        break
+        master_q_ref, option_map = prepared.resolve(record["images"])
         
         if not master_q_ref:
             continue
 
-        # 3. Retrieve Key and Score
-        if master_q_ref not in schema:
+        i = arrays.index.get(master_q_ref)
+        if i is None:
             continue
-            
-        q_data = schema[master_q_ref]
-        
-        # --- KEY MAPPING LOGIC START ---
-        official_key = q_data["key"]
-        q_type = q_data["question_type"]
-        max_marks = q_data["marks"]
-
-        display_key = official_key 
-
-        if q_type == "MCQ":
-            target_suffix = official_key.lower().strip()
-            mapped_label = None
-            if option_map:
-                for u_opt, suffix in option_map.items():
-                    if suffix == target_suffix:
-                         mapped_label = u_opt
-                         break
-            if mapped_label:
-                display_key = mapped_label
-
-        elif q_type == "MSQ":
-            off_suffixes = [x.strip().lower() for x in official_key.replace(";", ",").split(",") if x.strip()]
-            mapped_labels = []
-            if option_map:
-                for suff in off_suffixes:
-                    for u_opt, map_suff in option_map.items():
-                        if map_suff == suff:
-                            mapped_labels.append(u_opt)
-            if mapped_labels:
-                display_key = ";".join(sorted(mapped_labels))
-            else:
-                display_key = ";".join(sorted([x.strip() for x in official_key.replace(";", ",").split(",") if x.strip()]))
-
-        # --- SCORING LOGIC ---
-        # --- SCORING LOGIC ---
-        is_mta = "MTA" in official_key.upper()
-        
+
+        mask, value = (0, np.nan)
         if user_ans:
-            attempted += 1
-            is_correct = False
-            marks_gained = 0.0
-
-            if is_mta:
-                is_correct = True
-                marks_gained = max_marks
-            elif q_type == "MCQ":
-                if user_ans == display_key:
-                    is_correct = True
-                    marks_gained = max_marks
-                else:
-                    is_correct = False
-                    if max_marks == 1: marks_gained = -1/3
-                    elif max_marks == 2: marks_gained = -2/3
-            
-            elif q_type == "MSQ":
-                u_opts = sorted([x.strip() for x in user_ans.replace(";", ",").split(",") if x.strip()])
-                target_opts = sorted([x.strip() for x in display_key.replace(";", ",").split(",") if x.strip()])
-                
-                if u_opts == target_opts:
-                    is_correct = True
-                    marks_gained = max_marks
-                else:
-                    is_correct = False
-                    marks_gained = 0
-            
-            elif q_type == "NAT":
-                try:
-                    u_val = float(user_ans)
-                    low, high = parse_range(official_key)
-                    if low is not None and low <= u_val <= high + 1e-9:
-                        is_correct = True
-                        marks_gained = max_marks
-                    else:
-                        is_correct = False
-                        marks_gained = 0
-                except:
-                    is_correct = False
-                    marks_gained = 0
-            
-            if is_correct:
-                correct += 1
-            else:
-                wrong += 1
-            
-            total_score += marks_gained
-            details.append({
-                "Q": master_q_ref,
-                "Type": q_type,
-                "Status": status,
-                "User": user_ans,
-                "Key": display_key,
-                "MasterKey": official_key,
-                "Result": "Correct" if is_correct else "Wrong",
-                "Marks": marks_gained
-            })
-        else:
-            marks_gained = 0.0
-            details.append({
-                "Q": master_q_ref,
-                "Type": q_type,
-                "Status": status,
-                "User": "Not Attempted",
-                "Key": display_key,
-                "MasterKey": official_key,
-                "Result": "Unattempted",
-                "Marks": marks_gained
-            })
-
-    report = {
-        "summary": {
-            "total_questions": len(details),
-            "attempted": attempted,
-            "correct": correct,
-            "wrong": wrong,
-            "total_score": total_score
-        },
-        "details": details
+            mask, value = kernel.encode_answer(arrays.q_type[i], user_ans, option_map)
+        if details:
+            rows.append((master_q_ref, status, user_ans, option_map))
+        idx.append(i)
+        answered.append(user_ans is not None)
+        user_masks.append(mask)
+        user_vals.append(value)
+
+    # 2. Score every question in one vectorized pass
+    attempted_arr = np.array(answered, dtype=bool)
+    correct_arr, marks_arr = kernel.score(
+        arrays,
+        np.array(idx, dtype=np.intp),
+        attempted_arr,
+        np.array(user_masks, dtype=np.uint8),
+        np.array(user_vals, dtype=np.float64),
+    )
+
+    # 3. Report
+    attempted = int(attempted_arr.sum())
+    correct = int(correct_arr.sum())
+    summary = {
+        "total_questions": len(idx),
+        "attempted": attempted,
+        "correct": correct,
+        "wrong": attempted - correct,
+        "total_score": float(marks_arr.sum())
     }
-    
-    return report
+    metrics.observe("gate_stage_seconds", time.perf_counter() - started, stage="score")
+    return summary, _details(prepared, rows, correct_arr, marks_arr)
+
+def _details(prepared, rows, correct_arr, marks_arr):
+    for (ref, status, user_ans, option_map), is_correct, marks in zip(rows, correct_arr.tolist(), marks_arr.tolist()):
+        q_data = prepared.questions[ref]
+        if user_ans:
+            result = "Correct" if is_correct else "Wrong"
+        else:
+            result = "Unattempted"
+        yield {
+            "Q": ref,
+            "Type": q_data["question_type"],
+            "Status": status,
+            "User": user_ans if user_ans else "Not Attempted",
+            "Key": display_key(q_data, option_map),
+            "MasterKey": q_data["key"],
+            "Result": result,
+            "Marks": marks
+        }
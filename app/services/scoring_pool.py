@@ -0,0 +1,96 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+from . import profiler, scoring
+from .process_pool import ProcessPool
+
+# Parse + score is pure-Python CPU work, so threads in one gunicorn worker run
+# it one at a time under the GIL. With SCORING_PROCESSES > 0 it moves to a
+# process pool: the parent sends raw HTML bytes plus a schema id
+# (year, code, version) and the children, which keep their own preloaded
+# schema cache, send back the report.
+PROCESSES = int(os.getenv("SCORING_PROCESSES", "0"))
+PRELOAD = os.getenv("SCORING_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Child-side state
+_child_schemas = None
+
+
+def _init_child(preload):
+    global _child_schemas
+    from .storage import StorageService
+    from .schema_cache import SchemaCache
+
+    storage = StorageService()
+    storage.init_app(None)
+    _child_schemas = SchemaCache(storage)
+    if preload:
+        for year, codes in storage.list_papers("live", require="schema.json").items():
+            for code in codes:
+                _child_schemas.get(year, code)
+
+
+def _score_in_child(html, year, code, version, details=True):
+    schema = _child_schemas.get(year, code)
+    if schema is not None and schema.version != version:
+        # Parent has a newer (or older) schema than our cached copy
+        _child_schemas.invalidate(year, code)
+        schema = _child_schemas.get(year, code)
+    if schema is None or schema.version != version:
+        return None
+    with profiler.watch("score_child", year=year, code=code, html_bytes=len(html)):
+        return scoring.score_html(html, schema, details)
+
+
+_pool = ProcessPool("scoring", PROCESSES, _init_child, (PRELOAD,))
+
+
+def configure(processes):
+    """Overrides SCORING_PROCESSES in this process; 0 scores in the request thread (bench_scoring_pool compares sizes)."""
+    global PROCESSES
+    PROCESSES = processes
+    _pool.configure(processes)
+
+
+def get_pool():
+    """The scoring executor, whose children preload live schemas when started; None when disabled."""
+    return _pool.get()
+
+
+def score(html, schema, details=True):
+    """score_html on the process pool when configured, otherwise in this thread."""
+    pool = get_pool()
+    if pool is None or schema.year is None:
+        return scoring.score_html(html, schema, details)
+    try:
+        report = pool.submit(_score_in_child, html, schema.year, schema.code, schema.version, details).result()
+    except BrokenProcessPool:
+        # A child died (this or another task); the next call gets a new pool
+        _pool.reset(pool)
+        report = None
+    if report is None:
+        # Broken pool, or the child could not load this exact schema version (e.g. mid-upload)
+        return scoring.score_html(html, schema, details)
+    return report
+
+
+def score_iter(html, schema):
+    """
+    (summary, details iterator) for streaming. In-thread scoring builds the
+    detail dicts lazily; a pool child has already built them, so its list
+    is iterated as is.
+    """
+    if get_pool() is None or schema.year is None:
+        return scoring.score_html_iter(html, schema)
+    report = score(html, schema)
+    return report["summary"], iter(report["details"])
+
+
+def calculate_score(html_path, schema, details=True):
+    """Same contract as scoring.calculate_score, with scoring on the pool."""
+    try:
+        html = scoring.load_sheet(html_path)
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch URL: {e}")
+        return {"error": str(e)}
+    return score(html, schema, details)
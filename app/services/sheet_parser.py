@@ -0,0 +1,154 @@
+import os
+from bs4 import BeautifulSoup
+
+from . import metrics
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; BeautifulSoup remains the fallback
+    lxml = None
+
+# Question records emitted by every backend:
+# {
+#     "status": "Answered",
+#     "user_ans": "B" or None,
+#     "images": [(final_name, option_td_text or None), ...]
+# }
+# option_td_text is the stripped text of the <td> wrapping the image, which is
+# how scoring tells option images ("A." / "(A)") from the question image.
+
+def _has_class(el, name):
+    return name in (el.get("class") or "").split()
+
+def _parse_lxml(markup):
+    if isinstance(markup, bytes):
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        root = lxml.html.document_fromstring(markup, parser=parser)
+    else:
+        root = lxml.html.document_fromstring(markup)
+
+    # One walk over all tables in document order; each questionPnlTbl is paired
+    # with the first menu-tbl that follows it (same as bs4 find_next).
+    tables = list(root.iter("table"))
+    next_menu = [None] * len(tables)
+    menu = None
+    for idx in range(len(tables) - 1, -1, -1):
+        next_menu[idx] = menu
+        if _has_class(tables[idx], "menu-tbl"):
+            menu = tables[idx]
+
+    records = []
+    for idx, q_tbl in enumerate(tables):
+        if not _has_class(q_tbl, "questionPnlTbl"):
+            continue
+
+        status = "Not Attempted"
+        user_ans = None
+
+        menu_tbl = next_menu[idx]
+        if menu_tbl is not None:
+            cols = list(menu_tbl.iter("td"))
+            for k in range(0, len(cols) - 1, 2):
+                label = cols[k].text_content().strip()
+                val = cols[k+1].text_content().strip()
+
+                if "Question ID" in label:
+                    pass
+                elif "Status" in label:
+                    status = val
+                elif "Chosen Option" in label:
+                    user_ans = val
+                elif "Given Answer" in label:
+                    user_ans = val
+
+        # Fallback for NAT Answer
+        if user_ans is None:
+            q_row_tbl = next((t for t in q_tbl.iterdescendants("table") if _has_class(t, "questionRowTbl")), None)
+            if q_row_tbl is not None:
+                tds = list(q_row_tbl.iter("td"))
+                for k in range(len(tds)-1):
+                    txt = tds[k].text_content().strip()
+                    if "Given Answer" in txt and ":" in txt:
+                        user_ans = tds[k+1].text_content().strip()
+                        break
+
+        images = []
+        for img in q_tbl.iter("img"):
+            name = img.get("name", "")
+            final_name = name if name else img.get("src", "").split("/")[-1]
+            parent_td = next(img.iterancestors("td"), None)
+            td_text = None
+            if parent_td is not None:
+                td_text = "".join(t.strip() for t in parent_td.itertext())
+            images.append((final_name, td_text))
+
+        records.append({"status": status, "user_ans": user_ans, "images": images})
+    return records
+
+def _parse_bs4(markup):
+    soup = BeautifulSoup(markup, "html.parser")
+
+    records = []
+    for q_tbl in soup.find_all("table", class_="questionPnlTbl"):
+        status = "Not Attempted"
+        user_ans = None
+
+        menu_tbl = q_tbl.find_next("table", class_="menu-tbl")
+        if menu_tbl:
+            cols = menu_tbl.find_all("td")
+            for k in range(0, len(cols), 2):
+                if k+1 >= len(cols): break
+                label = cols[k].text.strip()
+                val = cols[k+1].text.strip()
+
+                if "Question ID" in label:
+                    pass
+                elif "Status" in label:
+                    status = val
+                elif "Chosen Option" in label:
+                    user_ans = val
+                elif "Given Answer" in label:
+                    user_ans = val
+
+        # Fallback for NAT Answer
+        if user_ans is None:
+            q_row_tbl = q_tbl.find("table", class_="questionRowTbl")
+            if q_row_tbl:
+                tds = q_row_tbl.find_all("td")
+                for k in range(len(tds)-1):
+                    txt = tds[k].text.strip()
+                    if "Given Answer" in txt and ":" in txt:
+                        user_ans = tds[k+1].text.strip()
+                        break
+
+        images = []
+        for img in q_tbl.find_all("img"):
+            src = img.get("src", "")
+            name = img.get("name", "")
+            final_name = name if name else src.split("/")[-1]
+            parent_td = img.find_parent("td")
+            td_text = parent_td.get_text(strip=True) if parent_td else None
+            images.append((final_name, td_text))
+
+        records.append({"status": status, "user_ans": user_ans, "images": images})
+    return records
+
+BACKENDS = {"bs4": _parse_bs4}
+if lxml is not None:
+    BACKENDS["lxml"] = _parse_lxml
+
+DEFAULT_BACKEND = os.getenv("HTML_PARSER", "lxml" if "lxml" in BACKENDS else "bs4")
+
+def parse_questions(markup, backend=None):
+    """
+    Parses a GATE response sheet (str, bytes or file object) into question records.
+    backend: "lxml" or "bs4"; defaults to HTML_PARSER env, falling back to bs4.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        print(f"[WARNING] HTML parser '{backend}' unavailable, using bs4")
+        backend = "bs4"
+    if hasattr(markup, "read"):
+        markup = markup.read()
+    with metrics.span("parse"):
+        return BACKENDS[backend](markup)
@@ -0,0 +1,93 @@
+import threading
+
+from . import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key within one worker: the first
+    caller runs fn, callers arriving while it is in flight wait for it and get
+    the same result (or the same exception). Nothing is kept once the call
+    returns, so this is not a cache; a later caller runs fn again.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.inc("gate_coalesced_total", group=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class SharedStream:
+    """
+    One lazily produced sequence read by several consumers, e.g. the detail
+    rows of a coalesced streamed report. Items are pulled from source on
+    demand by whichever consumer is furthest ahead and kept for the others,
+    so nobody waits on a slow client and nothing is produced twice.
+    on_done(items) runs once, in the consumer that reaches the end.
+    """
+    def __init__(self, head, source, on_done=None):
+        self.head = head
+        self._source = iter(source)
+        self._items = []
+        self._done = False
+        self._error = None
+        self._on_done = on_done
+        self._lock = threading.Lock()
+
+    def _pull(self, i):
+        """True if item i exists, producing items up to it if needed."""
+        with self._lock:
+            while len(self._items) <= i and not self._done:
+                try:
+                    self._items.append(next(self._source))
+                except StopIteration:
+                    self._done = True
+                    if self._on_done:
+                        self._on_done(self._items)
+                except Exception as e:
+                    # Every consumer fails the same way; a partial list is never handed to on_done
+                    self._done = True
+                    self._error = e
+            if i >= len(self._items) and self._error is not None:
+                raise self._error
+            return i < len(self._items)
+
+    def __iter__(self):
+        i = 0
+        while self._pull(i):
+            yield self._items[i]
+            i += 1
+
+    def all(self):
+        return list(self)
@@ -1,11 +1,56 @@
+import io
 import os
 import shutil
 import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: local index writes are then only locked per process
+    fcntl = None
+
+from . import metrics
+from .cache_util import atomic_write
+
+# Manifest of every paper folder ({root: {year: {code: [files]}}}) so listing
+# endpoints need one read instead of walking the bucket.
+INDEX_PATH = "index.json"
+INDEX_ROOTS = ("live", "staging")
+# Read-modify-write rounds before a contended index.json is rebuilt from the bucket
+INDEX_WRITE_ATTEMPTS = 3
+
+# Concurrent object calls per bulk copy/move/delete in Supabase mode
+CONCURRENCY = int(os.getenv("STORAGE_CONCURRENCY", "4"))
+# Supabase accepts at most this many prefixes per remove call
+REMOVE_BATCH = 1000
+# Objects overwritten by a bulk copy are parked here until it succeeds
+BACKUP_ROOT = ".rollback"
+# Seconds a "not found" from stat() is remembered in Supabase mode
+STAT_NEGATIVE_TTL = float(os.getenv("STAT_NEGATIVE_TTL", "5"))
+
+
+class StorageError(Exception):
+    """A bulk operation failed; results holds the outcome of every item."""
+    def __init__(self, message, results=None):
+        super().__init__(message)
+        self.results = results or []
 
 
 class StorageService:
     def __init__(self, app=None):
         self.mode = "local"
+        self._index = None
+        self._index_loaded_at = 0.0
+        self._index_lock = threading.RLock()
+        self.index_ttl = float(os.getenv("INDEX_TTL", "30"))
+        self._missing = {}  # path -> monotonic expiry of a negative stat()
+        self.cache = None
+        self._missing_lock = threading.Lock()
         if app:
             self.init_app(app)
 
@@ -26,6 +71,13 @@ class StorageService:
             
             from supabase import create_client
             self.client = create_client(self.supabase_url, self.supabase_key)
+
+            # Read-through disk cache in front of the bucket (0 disables it)
+            cache_bytes = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+            if cache_bytes > 0:
+                from .disk_cache import DiskCache
+                cache_dir = os.getenv("STORAGE_CACHE_DIR", os.path.join(self.base_path, "storage_cache"))
+                self.cache = DiskCache(cache_dir, cache_bytes, float(os.getenv("STORAGE_CACHE_FRESH", "2")))
             print("[Storage] Initialized Supabase Storage")
         else:
             self.mode = "local"
@@ -39,57 +91,204 @@ class StorageService:
         return os.path.join(self.base_path, path)
 
     def save(self, path, data_bytes, content_type="application/pdf"):
+        """data_bytes: bytes, or a seekable binary file object (streamed, not loaded)"""
+        with metrics.span("storage_write"):
+            result = self._save(path, data_bytes, content_type)
+        self._forget_missing(path)
+        return result
+
+    def _save(self, path, data_bytes, content_type):
         if self.mode == "local":
             full_path = self._get_local_path(path)
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, "wb") as f:
-                f.write(data_bytes)
+            # Write-then-rename so readers never see a half-written file
+            with atomic_write(full_path, "wb") as f:
+                if isinstance(data_bytes, bytes):
+                    f.write(data_bytes)
+                else:
+                    data_bytes.seek(0)
+                    shutil.copyfileobj(data_bytes, f, 1024 * 1024)
+                    data_bytes.seek(0)
             return full_path
         else:
             # Supabase Upload
+            body = self._upload_body(data_bytes)
             try:
                 self.client.storage.from_(self.bucket).upload(
                     path=path,
-                    file=data_bytes,
+                    file=body,
                     file_options={"content-type": content_type, "upsert": "true"}
                 )
-                return self.client.storage.from_(self.bucket).get_public_url(path)
+                url = self.client.storage.from_(self.bucket).get_public_url(path)
             except Exception as e:
                 print(f"[Storage Error] Save failed: {e}")
                 raise e
+            finally:
+                if body is not data_bytes and isinstance(body, io.IOBase):
+                    body.close()
+                if not isinstance(data_bytes, bytes):
+                    data_bytes.seek(0)
+
+            # Write-through: keep the local copy current under the new etag
+            if self.cache is not None:
+                self._forget_missing(path)
+                stat = self.stat(path)
+                try:
+                    if stat is not None:
+                        self.cache.store(path, data_bytes, stat["etag"])
+                    else:
+                        self.cache.drop(path)
+                except OSError as e:
+                    print(f"[Storage Error] Cache write failed for {path}: {e}")
+            return url
+
+    @staticmethod
+    def _upload_body(data):
+        """
+        storage3 streams BufferedReader/FileIO bodies and takes bytes as-is.
+        Disk-backed uploads get their own reader over the same file so they
+        are sent in chunks; in-memory buffers are small enough to pass as bytes.
+        """
+        if isinstance(data, bytes):
+            return data
+        try:
+            fd = data.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            data.seek(0)
+            return data.read()
+        reader = io.BufferedReader(io.FileIO(os.dup(fd), "rb"))
+        reader.seek(0)
+        return reader
 
     def read(self, path):
         """Returns bytes"""
-        if self.mode == "local":
-            full_path = self._get_local_path(path)
-            if not os.path.exists(full_path):
+        with metrics.span("storage_read"):
+            return self._read(path)
+
+    def _read(self, path):
+        if self.mode == "local" or (self.cache is not None and self.cache.file_path(path)):
+            full_path = self.local_path(path)
+            if full_path is None:
                 return None
-            with open(full_path, "rb") as f:
-                return f.read()
-        else:
             try:
-                res = self.client.storage.from_(self.bucket).download(path)
-                return res
-            except Exception as e:
-                print(f"[Storage Error] Read failed: {e}")
-                return None
-    
+                with open(full_path, "rb") as f:
+                    return f.read()
+            except OSError:
+                # Evicted between lookup and open
+                if self.mode == "local":
+                    return None
+        return self._download(path)
+
+    def _download(self, path):
+        try:
+            return self.client.storage.from_(self.bucket).download(path)
+        except Exception as e:
+            print(f"[Storage Error] Read failed: {e}")
+            return None
+
+    def local_path(self, path):
+        """
+        Path of a local file holding the object, or None if it does not exist.
+        Supabase mode serves from the disk cache, revalidating the cached copy
+        by etag and downloading it on a miss; without a cache it returns None.
+        """
+        if self.mode == "local":
+            full_path = self._get_local_path(path)
+            return full_path if os.path.isfile(full_path) else None
+        if self.cache is None or self.cache.file_path(path) is None:
+            return None
+
+        meta = self.cache.lookup(path)
+        if meta is not None and self.cache.is_fresh(meta):
+            self.cache.touch(path)
+            metrics.inc("gate_cache_requests_total", cache="storage", result="hit")
+            return self.cache.file_path(path)
+
+        stat = self.stat(path)
+        if stat is None:
+            self.cache.drop(path)
+            return None
+        if meta is not None and stat["etag"] is not None and stat["etag"] == meta.get("etag"):
+            self.cache.touch(path, meta)
+            metrics.inc("gate_cache_requests_total", cache="storage", result="revalidated")
+            return self.cache.file_path(path)
+
+        metrics.inc("gate_cache_requests_total", cache="storage", result="miss")
+        try:
+            data = self.client.storage.from_(self.bucket).download(path)
+        except Exception as e:
+            print(f"[Storage Error] Read failed: {e}")
+            return None
+        # If the object changed after the stat, the older etag just forces
+        # another download at the next revalidation
+        try:
+            return self.cache.store(path, data, stat["etag"])
+        except OSError as e:
+            print(f"[Storage Error] Cache write failed for {path}: {e}")
+            return None
+
     def exists(self, path):
+        """True if the object (or, locally, file/folder) at path exists."""
+        return self.stat(path) is not None
+
+    def stat(self, path):
+        """
+        Returns {"size", "etag", "mtime"} for one object, or None if it does
+        not exist. Supabase mode makes a single metadata request per object
+        and remembers misses for STAT_NEGATIVE_TTL seconds.
+        """
         if self.mode == "local":
-            return os.path.exists(self._get_local_path(path))
-        else:
-            # List files in dir and check match
-            # path: live/2025/CS/schema.json
-            directory = os.path.dirname(path)
-            filename = os.path.basename(path)
             try:
-                files = self.client.storage.from_(self.bucket).list(directory)
-                for f in files:
-                    if f['name'] == filename:
-                        return True
-                return False
-            except:
-                return False
+                st = os.stat(self._get_local_path(path))
+            except OSError:
+                return None
+            return {"size": st.st_size, "etag": f"{st.st_mtime_ns:x}-{st.st_size:x}", "mtime": st.st_mtime}
+
+        now = time.monotonic()
+        with self._missing_lock:
+            expires = self._missing.get(path)
+            if expires is not None:
+                if now < expires:
+                    return None
+                del self._missing[path]
+
+        try:
+            info = self.client.storage.from_(self.bucket).info(path)
+        except Exception as e:
+            if str(getattr(e, "status", "")) in ("400", "404"):
+                with self._missing_lock:
+                    self._missing[path] = now + STAT_NEGATIVE_TTL
+            else:
+                print(f"[Storage Error] Stat failed for {path}: {e}")
+            return None
+        return self._parse_info(info)
+
+    @staticmethod
+    def _parse_info(info):
+        metadata = info.get("metadata") or {}
+        etag = info.get("etag") or metadata.get("eTag") or info.get("version")
+        modified = info.get("last_modified") or info.get("lastModified") or info.get("updated_at") or metadata.get("lastModified")
+        mtime = None
+        if modified:
+            try:
+                mtime = datetime.fromisoformat(str(modified).replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                pass
+        return {
+            "size": info.get("size", metadata.get("size")),
+            "etag": etag.strip('"') if isinstance(etag, str) else etag,
+            "mtime": mtime,
+        }
+
+    def _drop_cached(self, *prefixes):
+        if self.cache is not None:
+            for prefix in prefixes:
+                self.cache.drop(prefix)
+
+    def _forget_missing(self, prefix):
+        """Drops negative stat() entries at or under prefix after a write."""
+        with self._missing_lock:
+            for path in [p for p in self._missing if p == prefix or p.startswith(prefix.rstrip("/") + "/")]:
+                del self._missing[path]
 
     def list(self, directory):
         """Returns list of item names (folders/files)"""
@@ -108,57 +307,216 @@ class StorageService:
                 return []
     
     def move(self, src, dst):
-        """Moves file or directory"""
+        """
+        Moves a file or a paper folder. Returns per-item results
+        ({"src", "dst", "status", "error"}); raises StorageError (with the
+        same results) if anything failed, after rolling back what it can.
+        """
+        try:
+            results = self._move(src, dst)
+        except StorageError as e:
+            results = e.results
+            self._update_index(lambda index: self._index_apply(index, results))
+            raise
+        finally:
+            self._forget_missing(dst)
+            self._drop_cached(src, dst)
+        self._update_index(lambda index: self._index_move(index, src, dst))
+        return results
+
+    def copy(self, src, dst):
+        """Copies a file or a paper folder; same results/StorageError contract as move."""
+        try:
+            results = self._copy(src, dst)
+        except StorageError as e:
+            results = e.results
+            self._update_index(lambda index: self._index_apply(index, results))
+            raise
+        finally:
+            self._forget_missing(dst)
+            self._drop_cached(dst)
+        self._update_index(lambda index: self._index_apply(index, results))
+        return results
+
+    def _pairs(self, src, dst):
+        """(src, dst) object paths for a folder's files, or the path itself for a single file."""
+        items = self.list(src)
+        if not items:
+            return [(src, dst)]
+        return [(f"{src}/{item}", f"{dst}/{item}") for item in items]
+
+    @staticmethod
+    def _bulk(fn, items):
+        """Runs fn over items on a bounded pool; returns [(item, error or None)] in input order."""
+        def run(item):
+            try:
+                fn(item)
+                return item, None
+            except Exception as e:
+                return item, str(e)
+
+        if len(items) <= 1:
+            return [run(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(CONCURRENCY, len(items)), thread_name_prefix="storage") as ex:
+            return list(ex.map(run, items))
+
+    def _remove_objects(self, paths):
+        """Batched remove; returns the set of paths Supabase reports as deleted."""
+        bucket = self.client.storage.from_(self.bucket)
+        batches = [paths[i:i + REMOVE_BATCH] for i in range(0, len(paths), REMOVE_BATCH)]
+        removed = set()
+        for batch, error in self._bulk(lambda b: removed.update(x["name"] for x in bucket.remove(b)), batches):
+            if error:
+                print(f"[Storage Error] Remove failed for {len(batch)} objects: {error}")
+        return removed
+
+    def _copy(self, src, dst):
         if self.mode == "local":
             full_src = self._get_local_path(src)
             full_dst = self._get_local_path(dst)
+            os.makedirs(os.path.dirname(full_dst), exist_ok=True)
+            if os.path.isdir(full_src):
+                shutil.copytree(full_src, full_dst, dirs_exist_ok=True)
+                names = sorted(os.listdir(full_src))
+            else:
+                shutil.copy2(full_src, full_dst)
+                names = None
+            if names is None:
+                return [{"src": src, "dst": dst, "status": "copied", "error": None}]
+            return [{"src": f"{src}/{n}", "dst": f"{dst}/{n}", "status": "copied", "error": None} for n in names]
+
+        pairs = self._pairs(src, dst)
+        bucket = self.client.storage.from_(self.bucket)
+        # Copy refuses to overwrite, so destinations that clash (as when the
+        # local backend replaces a folder) are first copied aside to a backup
+        # prefix and only then removed; a failed copy restores them.
+        existing = set(self.list(os.path.dirname(pairs[0][1])))
+        clashes = [d for _, d in pairs if os.path.basename(d) in existing]
+        backups = {}
+        if clashes:
+            token = uuid.uuid4().hex
+            backups = {d: f"{BACKUP_ROOT}/{token}/{d}" for d in clashes}
+            outcomes = self._bulk(lambda d: bucket.copy(d, backups[d]), clashes)
+            failed = [(d, error) for d, error in outcomes if error]
+            if failed:
+                self._remove_objects([backups[d] for d, error in outcomes if not error])
+                results = [
+                    {"src": s, "dst": d, "status": "skipped",
+                     "error": dict(failed).get(d, "destination could not be backed up")}
+                    for s, d in pairs
+                ]
+                raise StorageError(f"Copy {src} -> {dst}: could not back up {len(failed)} existing objects", results)
+            self._remove_objects(clashes)
+
+        outcomes = self._bulk(lambda pair: bucket.copy(pair[0], pair[1]), pairs)
+        results = [
+            {"src": s, "dst": d, "status": "failed" if error else "copied", "error": error}
+            for (s, d), error in outcomes
+        ]
+
+        # Verify every copy is listed before anyone removes a source
+        if all(r["status"] == "copied" for r in results):
+            listed = set(self.list(os.path.dirname(pairs[0][1])))
+            for r in results:
+                if os.path.basename(r["dst"]) not in listed:
+                    r["status"], r["error"] = "failed", "copy not found at destination"
+
+        failed = [r for r in results if r["status"] == "failed"]
+        if failed:
+            copied = [r for r in results if r["status"] == "copied"]
+            removed = self._remove_objects([r["dst"] for r in copied])
+            for r in copied:
+                r["status"] = "rolled_back" if r["dst"] in removed else "copied"
+            results += self._restore(backups, removed)
+            raise StorageError(f"Copy {src} -> {dst} failed for {len(failed)} of {len(results)} objects", results)
+        if backups:
+            self._remove_objects(list(backups.values()))
+        return results
+
+    def _restore(self, backups, removed):
+        """
+        Puts backed-up destination objects back after a failed copy. Returns
+        {"path", "status"} results only for objects that could not be
+        restored (their backup is kept for manual recovery).
+        """
+        bucket = self.client.storage.from_(self.bucket)
+        # Only destinations whose new copy is gone (or never landed) are free
+        todo = [d for d in backups if d in removed or not self.stat(d)]
+        outcomes = self._bulk(lambda d: bucket.copy(backups[d], d), todo)
+        restored = [d for d, error in outcomes if not error]
+        self._remove_objects([backups[d] for d in restored])
+        lost = []
+        for d, error in outcomes:
+            if error:
+                print(f"[Storage Error] Could not restore {d}; backup kept at {backups[d]}: {error}")
+                lost.append({"path": d, "status": "deleted", "error": f"not restored, backup at {backups[d]}"})
+        return lost
+
+    def _move(self, src, dst):
+        if self.mode == "local":
+            full_src = self._get_local_path(src)
+            full_dst = self._get_local_path(dst)
+            names = sorted(os.listdir(full_src)) if os.path.isdir(full_src) else None
             if os.path.exists(full_dst):
                 shutil.rmtree(full_dst)
             os.makedirs(os.path.dirname(full_dst), exist_ok=True)
             shutil.move(full_src, full_dst)
-        else:
-            # Supabase Move (Recursive for directories)
-            try:
-                items = self.list(src)
-                
-                if not items:
-                    # Maybe it's a single file? Try direct move
-                    self.client.storage.from_(self.bucket).move(src, dst)
-                    return
-                
-                # It's a directory, move children
-                for item in items:
-                    old_path = f"{src}/{item}"
-                    new_path = f"{dst}/{item}"
-                    try:
-                        self.client.storage.from_(self.bucket).move(old_path, new_path)
-                    except Exception as ex:
-                        print(f"[Storage Error] Failed to move {old_path}: {ex}")
+            if names is None:
+                return [{"src": src, "dst": dst, "status": "moved", "error": None}]
+            return [{"src": f"{src}/{n}", "dst": f"{dst}/{n}", "status": "moved", "error": None} for n in names]
 
-            except Exception as e:
-                print(f"[Storage Error] Move failed: {e}")
+        # Supabase: copy everything concurrently, verify, then remove the
+        # sources in one batched call. A failed copy rolls back the others and
+        # leaves the source untouched.
+        results = self._copy(src, dst)
+        removed = self._remove_objects([r["src"] for r in results])
+        for r in results:
+            if r["src"] in removed:
+                r["status"] = "moved"
+            else:
+                r["error"] = "copied, but the source could not be removed"
+        if any(r["status"] != "moved" for r in results):
+            raise StorageError(f"Move {src} -> {dst} left sources behind", results)
+        return results
 
     def delete(self, path):
+        try:
+            results = self._delete(path)
+        except StorageError as e:
+            results = e.results
+            self._update_index(lambda index: self._index_apply(index, results))
+            raise
+        finally:
+            self._drop_cached(path)
+        self._update_index(lambda index: self._index_remove(index, path))
+        return results
+
+    def _delete(self, path):
         if self.mode == "local":
             full_path = self._get_local_path(path)
             if os.path.isdir(full_path):
+                names = sorted(os.listdir(full_path))
                 shutil.rmtree(full_path)
+                return [{"path": f"{path}/{n}", "status": "deleted", "error": None} for n in names]
             elif os.path.exists(full_path):
                 os.remove(full_path)
+                return [{"path": path, "status": "deleted", "error": None}]
+            return []
         else:
-            # Supabase Delete (Recursive)
-            try:
-                # 1. Try list (for folder)
-                items = self.list(path)
-                if items:
-                    # Delete all files in folder
-                    files_to_remove = [f"{path}/{x}" for x in items]
-                    self.client.storage.from_(self.bucket).remove(files_to_remove)
-                else:
-                    # 2. Try single file
-                    self.client.storage.from_(self.bucket).remove([path])
-            except Exception as e:
-                print(f"[Storage Error] Delete failed: {e}")
+            # Supabase Delete: folder contents (or the single file) in batched remove calls
+            paths = [f"{path}/{x}" for x in self.list(path)] or [path]
+            removed = self._remove_objects(paths)
+            # A single path that was not an object is simply absent
+            if paths == [path] and not removed:
+                return []
+            results = [
+                {"path": p, "status": "deleted" if p in removed else "failed",
+                 "error": None if p in removed else "not removed"}
+                for p in paths
+            ]
+            if any(r["status"] == "failed" for r in results):
+                raise StorageError(f"Delete {path} failed for some objects", results)
+            return results
 
     def save_json(self, path, data):
         json_bytes = json.dumps(data, indent=4).encode('utf-8')
@@ -169,3 +527,198 @@ class StorageService:
         if data_bytes:
             return json.loads(data_bytes)
         return None
+
+    # --- Manifest Index ---
+
+    @staticmethod
+    def _split(path):
+        return [p for p in path.strip("/").split("/") if p]
+
+    @staticmethod
+    def _index_add(index, path):
+        parts = StorageService._split(path)
+        if len(parts) != 4 or parts[0] not in INDEX_ROOTS:
+            return
+        root, year, code, filename = parts
+        files = index.setdefault(root, {}).setdefault(year, {}).setdefault(code, [])
+        if filename not in files:
+            files.append(filename)
+            files.sort()
+
+    @staticmethod
+    def _index_pop(index, path):
+        """Removes a root, year or paper folder from the index and returns its subtree."""
+        parts = StorageService._split(path)
+        if not 1 <= len(parts) <= 3 or parts[0] not in INDEX_ROOTS:
+            return None
+        node = index
+        for part in parts[:-1]:
+            node = node.get(part)
+            if node is None:
+                return None
+        return node.pop(parts[-1], None)
+
+    @staticmethod
+    def _index_remove(index, path):
+        parts = StorageService._split(path)
+        if len(parts) == 4 and parts[0] in INDEX_ROOTS:
+            files = index.get(parts[0], {}).get(parts[1], {}).get(parts[2])
+            if files and parts[3] in files:
+                files.remove(parts[3])
+            return
+        StorageService._index_pop(index, path)
+
+    @staticmethod
+    def _index_move(index, src, dst):
+        src_parts = StorageService._split(src)
+        dst_parts = StorageService._split(dst)
+        if len(src_parts) == 4:
+            StorageService._index_remove(index, src)
+            StorageService._index_add(index, dst)
+            return
+        moved = StorageService._index_pop(index, src)
+        if moved is None or len(dst_parts) != len(src_parts) or dst_parts[0] not in INDEX_ROOTS:
+            return
+        node = index
+        for part in dst_parts[:-1]:
+            node = node.setdefault(part, {})
+        node[dst_parts[-1]] = moved
+
+    @staticmethod
+    def _index_apply(index, results):
+        """Applies per-item bulk results to the index (partial moves/copies/deletes)."""
+        for r in results:
+            if "path" in r:
+                if r["status"] == "deleted":
+                    StorageService._index_remove(index, r["path"])
+                continue
+            if r["status"] in ("copied", "moved"):
+                StorageService._index_add(index, r["dst"])
+            if r["status"] == "moved":
+                StorageService._index_remove(index, r["src"])
+
+    def _read_index(self, fresh=False):
+        # fresh: straight from the bucket, bypassing the disk cache's freshness window
+        data = self._download(INDEX_PATH) if fresh and self.mode != "local" else self.read(INDEX_PATH)
+        if data:
+            try:
+                return json.loads(data)
+            except ValueError:
+                print("[Storage Error] index.json is corrupt, rebuilding")
+        return None
+
+    def _write_index(self, index):
+        self._save(INDEX_PATH, json.dumps(index, sort_keys=True).encode('utf-8'), "application/json")
+        self._forget_missing(INDEX_PATH)
+
+    def get_index(self):
+        """Returns the in-memory manifest, re-reading index.json once per INDEX_TTL."""
+        with self._index_lock:
+            if self._index is None or time.monotonic() - self._index_loaded_at > self.index_ttl:
+                index = self._read_index()
+                if index is None:
+                    index = self.rebuild_index()
+                self._index = index
+                self._index_loaded_at = time.monotonic()
+            return self._index
+
+    def _update_index(self, mutate):
+        """
+        Applies mutate(index) to index.json. Mutations must be idempotent: a
+        write that raced with another worker's is detected and redone on top
+        of it. Local mode serialises writers with a file lock; Supabase mode
+        re-checks the etag before writing and reads the result back, and
+        rebuilds the manifest from the bucket if it still does not hold.
+        """
+        with self._index_lock:
+            try:
+                if self.mode == "local":
+                    with self._index_file_lock():
+                        index = self._read_index() or self._walk_bucket()
+                        mutate(index)
+                        self._write_index(index)
+                    self._index = index
+                elif not self._update_remote_index(mutate):
+                    print("[Storage Error] index.json kept changing under concurrent writes, rebuilding")
+                    self.rebuild_index()
+                    return
+            except Exception as e:
+                print(f"[Storage Error] Index write failed: {e}")
+                self._index_loaded_at = 0.0
+                return
+            self._index_loaded_at = time.monotonic()
+
+    def _update_remote_index(self, mutate):
+        for _ in range(INDEX_WRITE_ATTEMPTS):
+            before = self.stat(INDEX_PATH)
+            index = self._read_index(fresh=True) or self._walk_bucket()
+            mutate(index)
+            after = self.stat(INDEX_PATH)
+            if (before and before["etag"]) != (after and after["etag"]):
+                continue  # another worker wrote in between: redo on top of its version
+            self._write_index(index)
+            stored = self._read_index(fresh=True)
+            if stored is not None:
+                check = json.loads(json.dumps(stored))
+                mutate(check)
+                if check == stored:
+                    self._index = stored
+                    return True
+        return False
+
+    @contextmanager
+    def _index_file_lock(self):
+        """Exclusive lock across the gunicorn workers sharing this data/ directory."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.base_path, exist_ok=True)
+        with open(os.path.join(self.base_path, INDEX_PATH + ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def index_paper(self, folder):
+        """
+        Records a paper folder in the manifest as it is now stored (call after
+        publishing its files; saves do not touch the manifest).
+        """
+        parts = self._split(folder)
+        if len(parts) != 3 or parts[0] not in INDEX_ROOTS:
+            return
+        files = sorted(self.list(folder))
+
+        def mutate(index):
+            if files:
+                index.setdefault(parts[0], {}).setdefault(parts[1], {})[parts[2]] = files
+            else:
+                self._index_pop(index, folder)
+        self._update_index(mutate)
+
+    def _walk_bucket(self):
+        index = {}
+        for root in INDEX_ROOTS:
+            for year in self.list(root):
+                for code in self.list(f"{root}/{year}"):
+                    for filename in self.list(f"{root}/{year}/{code}"):
+                        self._index_add(index, f"{root}/{year}/{code}/{filename}")
+        return index
+
+    def rebuild_index(self):
+        """Walks the bucket and rewrites index.json from what is actually stored."""
+        index = self._walk_bucket()
+        with self._index_lock:
+            self._write_index(index)
+            self._index = index
+            self._index_loaded_at = time.monotonic()
+        print(f"[Storage] Rebuilt index: {sum(len(v) for r in index.values() for v in r.values())} papers")
+        return index
+
+    def list_papers(self, root, require=None):
+        """Returns {year: [codes]} for root from the manifest; optionally only papers containing `require`."""
+        tree = {}
+        for year, codes in self.get_index().get(root, {}).items():
+            tree[year] = sorted(code for code, files in codes.items() if not require or require in files)
+        return tree
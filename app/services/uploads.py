@@ -0,0 +1,98 @@
+import io
+import os
+import tempfile
+
+from flask import Request
+
+from . import fetcher
+
+# Uploaded PDFs are buffered once per file part: in memory up to
+# UPLOAD_SPOOL_MAX_MEMORY, on disk above it. Routes pass that buffer to both
+# storage and extraction instead of read()-ing it into bytes. Uploaded HTML
+# response sheets are parsed from bytes anyway, so they stay in memory up to
+# the sheet cap (FETCH_MAX_BYTES) and are never spooled.
+SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+
+
+class SheetBuffer(io.BytesIO):
+    """In-memory buffer for an uploaded sheet; past max_bytes it only notes the overflow."""
+    def __init__(self, max_bytes):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.overflow = False
+
+    def write(self, data):
+        if self.overflow or self.tell() + len(data) > self.max_bytes:
+            self.overflow = True
+            return len(data)
+        return super().write(data)
+
+
+def _is_sheet(content_type, filename):
+    return (content_type or "").startswith("text/html") or (filename or "").lower().endswith((".html", ".htm"))
+
+
+class UploadRequest(Request):
+    """Request class whose multipart PDF parts spool to disk above SPOOL_MAX_MEMORY."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if _is_sheet(content_type, filename):
+            return SheetBuffer(fetcher.MAX_BYTES)
+        size = content_length or total_content_length
+        if size is None:
+            return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+        if size > SPOOL_MAX_MEMORY:
+            return tempfile.TemporaryFile("w+b")
+        return io.BytesIO()
+
+
+def limit(req):
+    """Applies the upload size cap (413 above UPLOAD_MAX_BYTES); call before touching req.files."""
+    req.max_content_length = MAX_BYTES
+
+
+def stream_size(stream):
+    pos = stream.tell()
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(pos)
+    return size
+
+
+def detach(file_storage):
+    """
+    Takes ownership of an uploaded file's buffer so it outlives the request
+    (Request.close() closes everything in request.files). Returns the stream
+    rewound to 0, or None for an empty part. The caller must close it.
+    """
+    stream = file_storage.stream
+    file_storage.stream = io.BytesIO()
+    if not stream_size(stream) and not getattr(stream, "overflow", False):
+        stream.close()
+        return None
+    stream.seek(0)
+    return stream
+
+
+class TooLarge(ValueError):
+    """An uploaded sheet is over its byte limit (answered with 413)."""
+
+
+def read_limited(stream, max_bytes):
+    """Reads the rest of stream, raising TooLarge if it holds more than max_bytes."""
+    if getattr(stream, "overflow", False):
+        raise TooLarge(f"Response sheet exceeds {min(max_bytes, stream.max_bytes)} bytes")
+    if isinstance(stream, io.BytesIO) and not stream.tell():
+        # getvalue() hands over the buffer's bytes without copying them
+        data = stream.getvalue()
+        stream.seek(0, io.SEEK_END)
+    else:
+        data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise TooLarge(f"Response sheet exceeds {max_bytes} bytes")
+    return data
+
+
+def close_all(*streams):
+    for stream in streams:
+        if stream is not None:
+            stream.close()
@@ -0,0 +1,79 @@
+"""
+Answer-key extraction pages/sec versus EXTRACTION_PROCESSES pool size.
+
+    python -m benchmarks.bench_extraction [--sizes 0,1,2,4] [--repeat 3] [key.pdf [paper.pdf]]
+
+Without arguments it extracts a synthetic 2026-layout answer key (--questions
+rows) plus a --paper-pages question paper. PDFs are passed in memory, as the
+upload route does. Size 0 is the sequential baseline.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_answer_key_pdf, make_paper, make_question_paper_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("key_pdf", nargs="?")
+    parser.add_argument("paper_pdf", nargs="?")
+    parser.add_argument("--questions", type=int, default=65)
+    parser.add_argument("--rows-per-page", type=int, default=10)
+    parser.add_argument("--paper-pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", default=",".join(str(n) for n in sorted({0, 1, 2, os.cpu_count() or 1})))
+    args = parser.parse_args()
+
+    if args.key_pdf:
+        with open(args.key_pdf, "rb") as f:
+            key_bytes = f.read()
+        paper_bytes = None
+        if args.paper_pdf:
+            with open(args.paper_pdf, "rb") as f:
+                paper_bytes = f.read()
+    else:
+        schema, _ = make_paper(args.questions)
+        key_bytes = make_answer_key_pdf(schema, layout="2026", rows_per_page=args.rows_per_page)
+        paper_bytes = make_question_paper_pdf(schema, pages=args.paper_pages)
+
+    from app.services import extraction, extraction_pool
+
+    pages = {}
+
+    def count(stage, page, total):
+        pages[stage] = total
+
+    def run():
+        paper = io.BytesIO(paper_bytes) if paper_bytes else None
+        return extraction.extract_answer_key(io.BytesIO(key_bytes), paper_code="CS", paper_source=paper, progress=count)
+
+    extraction_pool.MIN_PAGES = 1
+    print(f"{'processes':>10} {'pages/s':>10} {'speedup':>8} {'keys':>6}")
+    baseline = None
+    expected = None
+    for size in [int(x) for x in args.sizes.split(",")]:
+        extraction_pool.configure(size)
+        result = run()  # warm the pool outside the timed region
+        expected = expected or result
+        assert result == expected, "pool output differs from the sequential run"
+
+        total_pages = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            pages.clear()
+            run()
+            total_pages += sum(pages.values())
+        pps = total_pages / (time.perf_counter() - start)
+        baseline = baseline or pps
+        print(f"{size:>10} {pps:>10.1f} {pps / baseline:>7.2f}x {len(result):>6}")
+
+    extraction_pool.configure(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Question/option resolution from image names: one search per subject versus
+the combined per-schema regex, on single-section and XE/XL-style papers.
+
+    python -m benchmarks.bench_image_matcher [--sections 1,4,8] [--questions 65,200] [--repeat 50]
+
+Sheets are parsed once; "resolve" times only the image walk over all question
+tables, "score" the whole score_html. The per-subject loop is the matcher
+scoring used before, kept here as the reference; both must agree on every
+question.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_paper
+
+
+def per_subject_matcher(schema):
+    subjects = {k.split("_")[0] for k in schema if "_" in k}
+    regexes = {subj: re.compile(rf"_{re.escape(subj.lower())}[a-z0-9]*q(\d+)") for subj in subjects}
+
+    def resolve(images):
+        ref = None
+        option_map = {}
+        for final_name, txt in images:
+            check_str = final_name.lower()
+            if txt is not None:
+                opt_label = None
+                if txt.startswith("A.") or txt.startswith("(A)"): opt_label = "A"
+                elif txt.startswith("B.") or txt.startswith("(B)"): opt_label = "B"
+                elif txt.startswith("C.") or txt.startswith("(C)"): opt_label = "C"
+                elif txt.startswith("D.") or txt.startswith("(D)"): opt_label = "D"
+                if opt_label:
+                    suffix = final_name.rsplit('.', 1)[0][-1].lower()
+                    if suffix in ['a', 'b', 'c', 'd']:
+                        option_map[opt_label] = suffix
+                    continue
+            if not ref:
+                for subj, regex in regexes.items():
+                    match = regex.search(check_str)
+                    if match:
+                        ref = f"{subj}_{int(match.group(1))}"
+                        break
+        return ref, option_map
+
+    return resolve
+
+
+def best_ms(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", default="1,4,8")
+    parser.add_argument("--questions", default="65,200")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    from app.services import scoring, sheet_parser
+
+    print(f"{'questions':>9} {'sections':>8} {'resolve old ms':>15} {'resolve new ms':>15} {'speedup':>8} "
+          f"{'score old ms':>13} {'score new ms':>13}")
+    for n in [int(x) for x in args.questions.split(",")]:
+        for sections in [int(x) for x in args.sections.split(",")]:
+            schema, html = make_paper(n, code="XE" if sections > 1 else "CS", sections=sections)
+            prepared = scoring.PreparedSchema(schema)
+            records = sheet_parser.parse_questions(html)
+            images = [record["images"] for record in records]
+            old = per_subject_matcher(schema)
+
+            for imgs in images:
+                assert old(imgs) == prepared.resolve(imgs), imgs
+
+            old_ms = best_ms(lambda: [old(imgs) for imgs in images], args.repeat)
+            new_ms = best_ms(lambda: [prepared.resolve(imgs) for imgs in images], args.repeat)
+
+            # Whole score_html with the old matcher patched in, for scale
+            resolve = prepared.resolve
+            prepared.resolve = old
+            score_old = best_ms(lambda: scoring.score_html(html, prepared, details=False), args.repeat // 5 or 1)
+            prepared.resolve = resolve
+            score_new = best_ms(lambda: scoring.score_html(html, prepared, details=False), args.repeat // 5 or 1)
+
+            print(f"{n:>9} {sections:>8} {old_ms:>15.3f} {new_ms:>15.3f} {old_ms / new_ms:>7.2f}x "
+                  f"{score_old:>13.2f} {score_new:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
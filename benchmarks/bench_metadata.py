@@ -0,0 +1,93 @@
+"""
+Latency and peak memory of detect_metadata and question-paper marks
+extraction, against the previous full pdfplumber text path.
+
+    python -m benchmarks.bench_metadata [--pages 40] [--repeat 5] [key.pdf [paper.pdf]]
+
+Memory is the tracemalloc peak of one call. Keys whose title has no session
+digit (e.g. --code CS) read all of page 0 to rule one out.
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber
+
+from benchmarks.fixtures import make_answer_key_pdf, make_paper, make_question_paper_pdf
+
+
+def full_text_metadata(data):
+    """Previous detect_metadata content path: extract_text() of page 0."""
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        text = pdf.pages[0].extract_text()
+    return re.search(r"GATE\s?(\d{4})", text, re.IGNORECASE)
+
+
+def full_text_marks(data):
+    """Previous marks path: extract_text() of every page."""
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        text = "".join(page.extract_text() or "" for page in pdf.pages)
+    return list(re.finditer(r"Q\.(\d+)[^\d]+Q\.(\d+)\s+Carry\s+(ONE|TWO)\s+mark", text, re.IGNORECASE))
+
+
+def measure(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    ms = (time.perf_counter() - start) / repeat * 1000
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return ms, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("key_pdf", nargs="?")
+    parser.add_argument("paper_pdf", nargs="?")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--code", default="CS1", help="paper code in the synthetic key title")
+    args = parser.parse_args()
+
+    if args.key_pdf:
+        with open(args.key_pdf, "rb") as f:
+            key_bytes = f.read()
+        with open(args.paper_pdf or args.key_pdf, "rb") as f:
+            paper_bytes = f.read()
+    else:
+        schema, _ = make_paper(65)
+        key_bytes = make_answer_key_pdf(schema, code=args.code, layout="2026")
+        paper_bytes = make_question_paper_pdf(schema, pages=args.pages)
+
+    from app.services import extraction
+
+    # Question numbers the answer key takes from the paper, as extract_answer_key computes them
+    needed = {str(q["question_no"]) for q in extraction.extract_answer_key(io.BytesIO(key_bytes)).values()}
+    cases = [
+        ("detect_metadata (key)", lambda: full_text_metadata(key_bytes),
+         lambda: extraction.detect_metadata(io.BytesIO(key_bytes))),
+        ("detect_metadata (paper)", lambda: full_text_metadata(paper_bytes),
+         lambda: extraction.detect_metadata(io.BytesIO(paper_bytes))),
+        ("marks, all pages", lambda: full_text_marks(paper_bytes),
+         lambda: extraction.extract_marks_from_paper(io.BytesIO(paper_bytes))),
+        ("marks, early stop", lambda: full_text_marks(paper_bytes),
+         lambda: extraction.extract_marks_from_paper(io.BytesIO(paper_bytes), needed=needed)),
+    ]
+
+    print(f"{'case':<26} {'old ms':>9} {'new ms':>9} {'speedup':>8} {'old KiB':>9} {'new KiB':>9}")
+    for name, old, new in cases:
+        old_ms, old_kib = measure(old, args.repeat)
+        new_ms, new_kib = measure(new, args.repeat)
+        print(f"{name:<26} {old_ms:>9.1f} {new_ms:>9.1f} {old_ms / new_ms:>7.1f}x {old_kib:>9.0f} {new_kib:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Time to first byte and allocation peak of /api/calculate per response mode.
+
+    python -m benchmarks.bench_report_stream [--questions 65,200] [--repeat 20]
+
+Sheets are uploaded as files, so nothing is fetched or cached. "first byte"
+is the time until the WSGI app yields its first chunk, "total" until the
+body is drained; "peak KiB" is the tracemalloc peak of one request.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_paper
+
+MODES = {
+    "json": {},
+    "stream": {"stream": "1"},
+    "summary_only": {"summary_only": "1"},
+}
+
+
+def request_once(app, html, fields):
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+    environ = EnvironBuilder(path="/api/calculate", method="POST", data={
+        "year": "2025", "paper_code": "CS", **fields,
+        "sheet": (io.BytesIO(html), "sheet.html"),
+    }).get_environ()
+    start = time.perf_counter()
+    app_iter, status, _ = run_wsgi_app(app, environ)
+    first = None
+    size = 0
+    for chunk in app_iter:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    if hasattr(app_iter, "close"):
+        app_iter.close()
+    assert status.startswith("200"), status
+    return first, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default="65,200")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="gate-bench-"))
+    os.environ.setdefault("STORAGE_TYPE", "local")
+    from app import create_app
+    from app.services import schema_bin
+
+    app = create_app()
+    print(f"{'questions':>9} {'mode':>13} {'first byte ms':>14} {'total ms':>9} {'bytes':>8} {'peak KiB':>9}")
+    for n in [int(x) for x in args.questions.split(",")]:
+        schema, html = make_paper(n)
+        schema_bin.save(app.storage, "live/2025/CS", schema)
+        app.schema_cache.invalidate("2025", "CS")
+        html = html.encode()
+        for mode, fields in MODES.items():
+            request_once(app, html, fields)
+            runs = [request_once(app, html, fields) for _ in range(args.repeat)]
+            first = sorted(r[0] for r in runs)[len(runs) // 2] * 1000
+            total = sorted(r[1] for r in runs)[len(runs) // 2] * 1000
+            tracemalloc.start()
+            request_once(app, html, fields)
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+            print(f"{n:>9} {mode:>13} {first:>14.2f} {total:>9.2f} {runs[0][2]:>8} {peak:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Size and load time of schema.json against the packed schema.bin.
+
+    python -m benchmarks.bench_schema_format [--questions 65,200,1000] [--repeat 500]
+
+Each paper is written through a local StorageService into a throwaway
+directory, the same way /api/upload_paper publishes it. "load" is reading and
+decoding the file (json: read_json + schema version hash; bin: mmap + decode,
+version from the header); "prepared" adds building the PreparedSchema, i.e.
+what a schema cache miss costs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_paper
+
+
+def per_call_us(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default="65,200,1000")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    from app.services import schema_bin
+    from app.services.scoring import PreparedSchema, schema_version
+    from app.services.storage import StorageService
+
+    storage = StorageService()
+    storage.mode = "local"
+    storage.base_path = tempfile.mkdtemp(prefix="gate-bench-")
+
+    def load_json(base_dir):
+        schema = storage.read_json(f"{base_dir}/schema.json")
+        return schema, schema_version(schema)
+
+    def load_bin(base_dir):
+        return schema_bin.load(storage, base_dir)
+
+    print(f"{'questions':>9} {'format':>6} {'bytes':>8} {'load us':>9} {'prepared us':>12}")
+    for n in [int(x) for x in args.questions.split(",")]:
+        schema, _ = make_paper(n, code="XE", sections=max(1, n // 60))
+        base_dir = f"live/2025/Q{n}"
+        schema_bin.save(storage, base_dir, schema)
+        assert load_bin(base_dir) == load_json(base_dir) == (schema, schema_version(schema))
+
+        for name, load in (("json", load_json), ("bin", load_bin)):
+            size = os.path.getsize(storage.local_path(f"{base_dir}/schema.{name}"))
+            load_us = per_call_us(lambda: load(base_dir), args.repeat)
+
+            def prepared():
+                loaded, version = load(base_dir)
+                return PreparedSchema(loaded, version=version)
+            prepared_us = per_call_us(prepared, max(args.repeat // 5, 1))
+            print(f"{n:>9} {name:>6} {size:>8} {load_us:>9.1f} {prepared_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Requests/sec of parse+score versus SCORING_PROCESSES pool size.
+
+    python -m benchmarks.bench_scoring_pool [--requests 200] [--threads 8] [--sizes 0,1,2,4]
+
+Size 0 is the in-thread baseline (GIL-bound). Runs against a throwaway local
+data/ directory with one synthetic 65-question paper.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_paper
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=65)
+    parser.add_argument("--sizes", default=",".join(str(n) for n in sorted({0, 1, 2, os.cpu_count() or 1})))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="gate-bench-")
+    os.chdir(workdir)
+    schema_dict, html = make_paper(args.questions)
+    os.makedirs("data/live/2025/CS")
+    with open("data/live/2025/CS/schema.json", "w") as f:
+        json.dump(schema_dict, f)
+    html = html.encode("utf-8")
+
+    from app.services import scoring_pool
+    from app.services.schema_cache import SchemaCache
+    from app.services.storage import StorageService
+
+    storage = StorageService()
+    storage.init_app(None)
+    schema = SchemaCache(storage).get("2025", "CS")
+
+    print(f"{'processes':>10} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for size in [int(x) for x in args.sizes.split(",")]:
+        scoring_pool.configure(size)
+        # Warm the pool (spawn + schema preload) outside the timed region
+        for _ in range(max(size, 1)):
+            scoring_pool.score(html, schema)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as ex:
+            list(ex.map(lambda _: scoring_pool.score(html, schema), range(args.requests)))
+        rps = args.requests / (time.perf_counter() - start)
+        baseline = baseline or rps
+        print(f"{size:>10} {rps:>10.1f} {rps / baseline:>7.2f}x")
+
+    scoring_pool.configure(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Peak RSS of one /api/upload_paper request (save + extraction) per upload size.
+
+    python -m benchmarks.bench_upload_memory [--sizes-mb 1,10,25] [--spool-mb 1]
+
+Each case runs in a fresh process against a throwaway local data/ directory.
+The request body is built before measuring, so the figure is what the server
+adds on top of it: "peak delta" is VmHWM minus RSS just before the request
+(Linux; the HWM is reset through /proc/self/clear_refs). The "in memory" row
+raises UPLOAD_SPOOL_MAX_MEMORY above the upload size, which approximates
+holding the whole upload in memory as bytes.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _status_kib(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(size_mb):
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+    from app import create_app
+    from benchmarks.fixtures import make_answer_key_pdf, make_paper, make_question_paper_pdf
+
+    schema, _ = make_paper(65)
+    key_pdf = make_answer_key_pdf(schema, layout="2026", padding=int(size_mb * 1024 * 1024))
+    paper_pdf = make_question_paper_pdf(schema, pages=10)
+
+    app = create_app()
+    builder = EnvironBuilder(path="/api/upload_paper", method="POST", headers={"X-Admin-Pin": os.environ["ADMIN_PIN"]}, data={
+        "year": "2025", "paper_code": "CS", "mode": "live",
+        "answer_key": (io.BytesIO(key_pdf), "answer_key.pdf"),
+        "question_paper": (io.BytesIO(paper_pdf), "question_paper.pdf"),
+    })
+    environ = builder.get_environ()
+    del key_pdf
+
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    before = _status_kib("VmRSS")
+    start = time.perf_counter()
+    app_iter, status, _ = run_wsgi_app(app, environ, buffered=True)
+    body = json.loads(b"".join(app_iter))
+    if status.startswith("202"):
+        while app.jobs.get(body["job_id"])["status"] not in ("done", "failed"):
+            time.sleep(0.01)
+        body = app.jobs.get(body["job_id"])
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "status": body.get("status", status),
+        "peak_delta_kib": _status_kib("VmHWM") - before,
+        "seconds": elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", default="1,10,25")
+    parser.add_argument("--spool-mb", type=float, default=1)
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child)
+        return
+
+    print(f"{'upload MB':>10} {'buffer':>10} {'peak delta MB':>14} {'seconds':>8} {'job':>6}")
+    for size_mb in [float(x) for x in args.sizes_mb.split(",")]:
+        for label, spool_mb in (("spooled", args.spool_mb), ("in memory", size_mb * 2 + 1)):
+            env = dict(os.environ,
+                       ADMIN_PIN="bench",
+                       STORAGE_TYPE="local",
+                       # Fixed glibc mmap threshold: large buffers freed while
+                       # building the request go back to the OS instead of
+                       # being reused invisibly inside the measured window
+                       MALLOC_MMAP_THRESHOLD_="131072",
+                       UPLOAD_SPOOL_MAX_MEMORY=str(int(spool_mb * 1024 * 1024)),
+                       UPLOAD_MAX_BYTES=str(int((size_mb * 2 + 10) * 1024 * 1024)))
+            out = subprocess.run([sys.executable, "-m", "benchmarks.bench_upload_memory", "--child", str(size_mb)],
+                                 cwd=tempfile.mkdtemp(prefix="gate-bench-"), env=dict(env, PYTHONPATH=ROOT),
+                                 capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{size_mb:>10g} {label:>10} {result['peak_delta_kib'] / 1024:>14.1f} {result['seconds']:>8.2f} {result['status']:>6}")
+
+
+if __name__ == "__main__":
+    main()
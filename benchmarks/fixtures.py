@@ -0,0 +1,185 @@
+"""
+Synthetic GATE fixtures for offline benchmarks.
+
+make_paper() returns a schema plus a response sheet with the same structure as
+the candidate portal: one questionPnlTbl per question holding a questionRowTbl
+(question image, shuffled option images labelled "A." ... "D.", NAT "Given
+Answer") followed by a menu-tbl with Status / Chosen Option.
+
+make_answer_key_pdf() / make_question_paper_pdf() write minimal text-only PDFs
+with ruled answer-key tables (2025 six-column or 2026 four-column layout) and
+"Q.X - Q.Y Carry ONE mark" lines, enough for pdfplumber to extract a schema.
+"""
+import random
+
+SUBJECT_CODES = ["CS", "DA", "EC", "EE", "ME", "CE", "XE", "XL"]
+
+
+def make_schema(subjects, rng):
+    schema = {}
+    for subj, count in subjects:
+        for q in range(1, count + 1):
+            q_type = rng.choice(["MCQ", "MCQ", "MSQ", "NAT"])
+            if q_type == "MCQ":
+                key = rng.choice("ABCD")
+            elif q_type == "MSQ":
+                key = ";".join(sorted(rng.sample("ABCD", rng.randint(1, 3))))
+            else:
+                low = round(rng.uniform(0, 50), 2)
+                key = f"{low} to {round(low + rng.choice([0, 0.5]), 2)}" if rng.random() < 0.7 else str(low)
+            if rng.random() < 0.03:
+                key = "MTA"
+            schema[f"{subj}_{q}"] = {
+                "question_no": q,
+                "section": subj,
+                "original_section": subj,
+                "question_type": q_type,
+                "key": key,
+                "marks": rng.choice([1.0, 2.0]),
+            }
+    return schema
+
+
+def make_sheet(schema, code, rng, attempt_rate=0.8):
+    prefix = f"{code.lower()}25s1"
+    parts = ["<html><head><title>Response Sheet</title></head><body>"]
+    for ref, q in schema.items():
+        subj = ref.split("_")[0].lower()
+        q_no = q["question_no"]
+        q_type = q["question_type"]
+        stem = f"{prefix}_{subj}q{q_no}"
+
+        parts.append('<div class="question-pnl"><table class="questionPnlTbl"><tbody><tr><td>')
+        parts.append('<table class="questionRowTbl"><tbody>')
+        parts.append(f'<tr><td class="bold">Q.{q_no}</td><td class="bold"><img name="{stem}.png" src="/per/g01/pub/{stem}.png"></td></tr>')
+
+        answer = None
+        attempted = rng.random() < attempt_rate
+        if q_type in ("MCQ", "MSQ"):
+            suffixes = list("abcd")
+            rng.shuffle(suffixes)
+            for label, suffix in zip("ABCD", suffixes):
+                parts.append(f'<tr><td></td><td class="wrngAns">{label}. <img src="/per/g01/pub/{stem}{suffix}.png"></td></tr>')
+            if attempted:
+                answer = rng.choice("ABCD") if q_type == "MCQ" else ",".join(sorted(rng.sample("ABCD", rng.randint(1, 3))))
+        elif attempted:
+            answer = str(round(rng.uniform(0, 50), 2)) if rng.random() < 0.5 else q["key"].split(" to ")[0]
+            parts.append(f'<tr><td>Given Answer :</td><td class="bold">{answer}</td></tr>')
+        else:
+            parts.append('<tr><td>Given Answer :</td><td class="bold">--</td></tr>')
+
+        parts.append('</tbody></table></td><td><table class="menu-tbl"><tbody>')
+        parts.append(f'<tr><td>Question Type :</td><td class="bold">{q_type}</td></tr>')
+        parts.append(f'<tr><td>Question ID :</td><td class="bold">{640000 + q_no}</td></tr>')
+        parts.append(f'<tr><td>Status :</td><td class="bold">{"Answered" if answer else "Not Answered"}</td></tr>')
+        if q_type != "NAT":
+            parts.append(f'<tr><td>Chosen Option :</td><td class="bold">{answer or "--"}</td></tr>')
+        parts.append('</tbody></table></td></tr></tbody></table></div>')
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def make_paper(questions=65, code="CS", sections=1, seed=0):
+    """
+    Returns (schema, html). 10 GA questions plus `questions - 10` subject
+    questions spread over `sections` subject sections (XE/XL style when > 1).
+    """
+    rng = random.Random(seed)
+    subject_total = max(questions - 10, 0)
+    if sections <= 1:
+        subjects = [("GA", min(questions, 10)), (code, subject_total)]
+    else:
+        per = max(subject_total // sections, 1)
+        subjects = [("GA", min(questions, 10))] + [(f"{code}{chr(ord('A') + i)}", per) for i in range(sections)]
+    schema = make_schema(subjects, rng)
+    return schema, make_sheet(schema, code, rng)
+
+
+def _pdf(pages, padding=0):
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, content in enumerate(pages):
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        data = content.encode("latin-1")
+        objs.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+    if padding:
+        # Unreferenced binary stream (like an embedded scan) to reach a target file size
+        objs.append(b"<< /Length %d >>\nstream\n" % padding + random.Random(padding).randbytes(padding) + b"\nendstream")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _text(x, y, text, size=9):
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"BT /F1 {size} Tf {x} {y} Td ({text}) Tj ET\n"
+
+
+def make_answer_key_pdf(schema, code="CS", year="2025", layout="2025", rows_per_page=35, padding=0):
+    """
+    Answer key PDF for `schema`; layout "2025" has Marks, "2026" does not.
+    padding: extra bytes of unreferenced binary data, to simulate large files.
+    """
+    if layout == "2025":
+        header = ["Q. No.", "Session", "Que. Type", "Sec. Name", "Key/Range", "Marks"]
+        widths = [50, 60, 70, 150, 110, 50]
+    else:
+        header = ["Q. No.", "Q. Type", "Section", "Key/Range"]
+        widths = [60, 80, 200, 150]
+    rows = []
+    for ref, q in schema.items():
+        section = "General Aptitude" if ref.startswith("GA") else ref.split("_")[0]
+        if layout == "2025":
+            rows.append([str(q["question_no"]), "1", q["question_type"], section, q["key"], str(int(q["marks"]))])
+        else:
+            rows.append([str(q["question_no"]), q["question_type"], section, q["key"]])
+
+    pages = []
+    top, row_h, left = 770, 20, 40
+    width = sum(widths)
+    for start in range(0, len(rows), rows_per_page):
+        chunk = [header] + rows[start:start + rows_per_page]
+        content = _text(60, 800, f"GATE {year} Answer Key for Paper ({code})", 12) if start == 0 else ""
+        for r in range(len(chunk) + 1):
+            y = top - r * row_h
+            content += f"{left} {y} m {left + width} {y} l S\n"
+        x = left
+        for w in widths + [0]:
+            content += f"{x} {top} m {x} {top - len(chunk) * row_h} l S\n"
+            x += w
+        for r, row in enumerate(chunk):
+            x = left
+            for w, cell in zip(widths, row):
+                content += _text(x + 3, top - r * row_h - 14, cell)
+                x += w
+        pages.append(content)
+    return _pdf(pages, padding)
+
+
+def make_question_paper_pdf(schema, pages=10, year="2025"):
+    """Question paper PDF whose text carries the ONE/TWO mark ranges."""
+    subject = sorted({q["question_no"] for ref, q in schema.items() if not ref.startswith("GA")})
+    half = len(subject) // 2
+    marks_lines = {0: "Q.1 - Q.5 Carry ONE mark Each", 1: "Q.6 - Q.10 Carry TWO mark Each"}
+    if subject:
+        marks_lines[2] = f"Q.1 - Q.{half} Carry ONE mark Each"
+        marks_lines[5] = f"Q.{half + 1} - Q.{len(subject)} Carry TWO mark Each"
+    out = []
+    for i in range(pages):
+        content = _text(60, 800, f"GATE {year} Question Paper page {i + 1}", 12)
+        if i in marks_lines:
+            content += _text(60, 760, marks_lines[i], 10)
+        for line in range(30):
+            content += _text(60, 700 - line * 20, f"Question text line {line} on page {i + 1} with some filler words", 9)
+        out.append(content)
+    return _pdf(out)
@@ -0,0 +1,323 @@
+"""
+Offline end-to-end benchmark suite: latency percentiles, throughput and peak
+memory per stage, checked against benchmarks/baseline.json.
+
+    python -m benchmarks.suite [--quick] [--only score,extract] [--tolerance 0.5]
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --sheet sheet.html --schema schema.json \\
+        --key-pdf key.pdf [--paper-pdf paper.pdf]     # recorded fixtures
+
+Stages cover sheet parsing (lxml and bs4), scoring, answer-key extraction
+(2025 and 2026 layouts), detect_metadata, schema loading and the local
+StorageService operations. Inputs are synthetic (benchmarks.fixtures) unless
+recorded files are given. Before timing, the lxml and bs4 parsers must
+produce identical records and extraction must recover every question of the
+synthetic key, otherwise the run fails.
+
+A stage regresses when its p50 exceeds the baseline by more than
+--tolerance (default 50%) and 0.5 ms, or its peak memory by more than
+--memory-tolerance (default 25%). Baseline timings are first rescaled by a
+calibration loop timed next to each stage, so a slower or busier machine
+does not read as a regression. A flagged stage is measured once more and
+keeps its faster run; a confirmed regression prints REGRESSION and exits 1.
+Re-record the baseline with --save-baseline after intended changes.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import make_answer_key_pdf, make_paper, make_question_paper_pdf
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+class Stage:
+    """One timed operation. setup() runs untimed before every call."""
+    def __init__(self, name, fn, repeat=1.0, setup=None):
+        self.name = name
+        self.fn = fn
+        self.repeat = repeat  # fraction of --repeat (slow stages run fewer times)
+        self.setup = setup
+
+
+def quiet(fn):
+    """Runs fn with stdout discarded (the app logs [DEBUG] lines per call)."""
+    def run():
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            return fn()
+        finally:
+            sys.stdout = stdout
+    return run
+
+
+def calibrate():
+    """
+    Milliseconds for a fixed pure-Python workload (best of 5). Measured next to
+    every stage so comparisons follow the machine's current speed (CPU
+    frequency, noisy neighbours) instead of assuming it matches the baseline's.
+    """
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        json.dumps([{"q": i, "key": str(i * 7), "marks": i / 3} for i in range(2000)])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def measure(stage, repeat):
+    from app.services.batch import percentile
+
+    n = max(int(repeat * stage.repeat), 3)
+    fn = quiet(stage.fn)
+    setup = quiet(stage.setup) if stage.setup else None
+    if setup:
+        setup()
+    fn()  # warm-up: imports, caches, lazily built pools
+    # Like timeit: start from a collected heap and keep the cyclic GC out of
+    # the timings, so garbage left by earlier stages is not billed to this one
+    gc.collect()
+    gc.disable()
+    timings = []
+    try:
+        for _ in range(n):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "runs": n,
+        "calibration_ms": calibrate(),
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "ops_per_s": n / sum(timings),
+        "peak_kib": peak / 1024,
+    }
+
+
+def load_inputs(args):
+    """[(label, schema, html bytes)], key_pdf, paper_pdf, expected questions in the key."""
+    sheets = []
+    if args.sheet:
+        with open(args.schema) as f:
+            schema = json.load(f)
+        with open(args.sheet, "rb") as f:
+            sheets.append(("recorded", schema, f.read()))
+    else:
+        for n in args.questions:
+            # Above a single paper's size, spread questions over XE-style sections
+            sections = 1 if n <= 65 else 3
+            schema, html = make_paper(n, code="XE" if sections > 1 else "CS", sections=sections)
+            sheets.append((f"q={n}", schema, html.encode("utf-8")))
+
+    if args.key_pdf:
+        with open(args.key_pdf, "rb") as f:
+            keys = {"recorded": f.read()}
+        paper_pdf = None
+        if args.paper_pdf:
+            with open(args.paper_pdf, "rb") as f:
+                paper_pdf = f.read()
+        expected = None
+    else:
+        schema, _ = make_paper(65)
+        keys = {layout: make_answer_key_pdf(schema, code="CS1", layout=layout) for layout in ("2025", "2026")}
+        paper_pdf = make_question_paper_pdf(schema, pages=20)
+        expected = len(schema)
+    return sheets, keys, paper_pdf, expected
+
+
+def check_parity(sheets, keys, paper_pdf, expected):
+    """Fails before timing if parsers disagree or extraction loses questions."""
+    from app.services import extraction, sheet_parser
+
+    problems = []
+    if "lxml" in sheet_parser.BACKENDS:
+        for label, _, html in sheets:
+            if sheet_parser.parse_questions(html, "lxml") != sheet_parser.parse_questions(html, "bs4"):
+                problems.append(f"lxml and bs4 records differ for sheet {label}")
+    else:
+        print("lxml not installed: parser parity not checked")
+
+    for layout, key_pdf in keys.items():
+        paper = io.BytesIO(paper_pdf) if paper_pdf else None
+        schema = quiet(lambda: extraction.extract_answer_key(io.BytesIO(key_pdf), paper_code="CS", paper_source=paper))()
+        if not schema or (expected is not None and len(schema) != expected):
+            problems.append(f"extraction of the {layout} key found {len(schema or {})} questions, expected {expected}")
+    return problems
+
+
+def build_stages(args, sheets, keys, paper_pdf, workdir):
+    from app.services import extraction, schema_bin, scoring, sheet_parser
+    from app.services.scoring import PreparedSchema
+    from app.services.storage import StorageService
+
+    stages = []
+    for label, schema, html in sheets:
+        prepared = PreparedSchema(schema, year="2025", code="CS")
+        for backend in sheet_parser.BACKENDS:
+            stages.append(Stage(f"parse.{backend}[{label}]", lambda html=html, b=backend: sheet_parser.parse_questions(html, b)))
+        stages.append(Stage(f"score[{label}]", lambda html=html, p=prepared: scoring.score_html(html, p)))
+        stages.append(Stage(f"score.summary_only[{label}]", lambda html=html, p=prepared: scoring.score_html(html, p, details=False)))
+
+        path = os.path.join(workdir, f"sheet-{label}.html")
+        with open(path, "wb") as f:
+            f.write(html)
+        stages.append(Stage(f"calculate_score[{label}]", lambda path=path, p=prepared: scoring.calculate_score(path, p)))
+
+    for layout, key_pdf in keys.items():
+        stages.append(Stage(f"extract.{layout}", lambda k=key_pdf: extraction.extract_answer_key(
+            io.BytesIO(k), paper_code="CS", paper_source=io.BytesIO(paper_pdf) if paper_pdf else None), repeat=0.2))
+        stages.append(Stage(f"detect_metadata.{layout}", lambda k=key_pdf: extraction.detect_metadata(io.BytesIO(k)), repeat=0.5))
+
+    # Local StorageService in a throwaway data directory
+    storage = StorageService()
+    storage.mode = "local"
+    storage.base_path = os.path.join(workdir, "data")
+    pdf = next(iter(keys.values()))
+    schema = sheets[0][1]
+    quiet(lambda: (storage.save("live/2025/CS/answer_key.pdf", pdf), schema_bin.save(storage, "live/2025/CS", schema)))()
+
+    def reset_folder(path):
+        storage.delete(path)
+        storage.copy("live/2025/CS", path)
+
+    stages += [
+        Stage("storage.save", lambda: storage.save("staging/2025/CS/answer_key.pdf", pdf)),
+        Stage("storage.read", lambda: storage.read("live/2025/CS/answer_key.pdf")),
+        Stage("storage.stat", lambda: storage.stat("live/2025/CS/schema.json")),
+        Stage("storage.copy", lambda: storage.copy("live/2025/CS", "staging/2025/CP"),
+              setup=lambda: storage.delete("staging/2025/CP")),
+        Stage("storage.move", lambda: storage.move("staging/2025/MV", "live/2025/MV"),
+              setup=lambda: (storage.delete("live/2025/MV"), reset_folder("staging/2025/MV"))),
+        Stage("storage.delete", lambda: storage.delete("staging/2025/DL"),
+              setup=lambda: reset_folder("staging/2025/DL")),
+        Stage("schema.load_json", lambda: storage.read_json("live/2025/CS/schema.json")),
+        Stage("schema.load_bin", lambda: schema_bin.load(storage, "live/2025/CS")),
+    ]
+
+    if args.only:
+        stages = [s for s in stages if any(s.name.startswith(prefix) for prefix in args.only)]
+    return stages
+
+
+# p50 differences below this are timer and scheduler noise, whatever the ratio
+MIN_DELTA_MS = 0.5
+
+
+def compare(name, res, base, tolerance, memory_tolerance):
+    """Regression messages for one stage against its baseline entry."""
+    regressions = []
+    # Baseline p50 rescaled to this machine's current speed
+    expected = base["p50_ms"] * res["calibration_ms"] / base["calibration_ms"]
+    if res["p50_ms"] > expected * (1 + tolerance) and res["p50_ms"] - expected > MIN_DELTA_MS:
+        regressions.append(f"{name}: p50 {res['p50_ms']:.2f} ms vs baseline {base['p50_ms']:.2f} ms "
+                           f"({expected:.2f} ms at the current machine speed)")
+    # Tiny allocations are noise: compare memory only above 64 KiB
+    if res["peak_kib"] > 64 and res["peak_kib"] > base["peak_kib"] * (1 + memory_tolerance):
+        regressions.append(f"{name}: peak {res['peak_kib']:.0f} KiB vs baseline {base['peak_kib']:.0f} KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default="65,200", help="synthetic sheet sizes")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--quick", action="store_true", help="repeat 10, for smoke runs")
+    parser.add_argument("--only", help="comma-separated stage name prefixes")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--sheet", help="recorded response-sheet HTML (needs --schema)")
+    parser.add_argument("--schema", help="schema.json for --sheet")
+    parser.add_argument("--key-pdf", help="recorded answer-key PDF")
+    parser.add_argument("--paper-pdf", help="recorded question-paper PDF (with --key-pdf)")
+    args = parser.parse_args()
+    args.questions = [int(x) for x in args.questions.split(",")]
+    args.only = args.only.split(",") if args.only else None
+    if args.sheet and not args.schema:
+        parser.error("--sheet needs --schema")
+    repeat = 10 if args.quick else args.repeat
+
+    baseline = None
+    if not args.save_baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except OSError:
+            print(f"No baseline at {args.baseline}; record one with --save-baseline")
+
+    workdir = tempfile.mkdtemp(prefix="gate-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("STORAGE_TYPE", "local")
+    results = {}
+    regressions = []
+    try:
+        sheets, keys, paper_pdf, expected = load_inputs(args)
+        problems = check_parity(sheets, keys, paper_pdf, expected)
+        if problems:
+            for problem in problems:
+                print(f"PARITY FAILURE: {problem}")
+            sys.exit(1)
+
+        print(f"{'stage':<34} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak KiB':>9}")
+        for stage in build_stages(args, sheets, keys, paper_pdf, workdir):
+            res = measure(stage, repeat)
+            base = (baseline or {}).get("stages", {}).get(stage.name)
+            if base and compare(stage.name, res, base, args.tolerance, args.memory_tolerance):
+                # Confirm before failing: a second run rules out a noisy neighbour
+                retry = measure(stage, repeat)
+                if retry["p50_ms"] < res["p50_ms"]:
+                    res = retry
+                regressions += compare(stage.name, res, base, args.tolerance, args.memory_tolerance)
+            results[stage.name] = res
+            print(f"{stage.name:<34} {res['runs']:>5} {res['p50_ms']:>9.2f} {res['p95_ms']:>9.2f} "
+                  f"{res['p99_ms']:>9.2f} {res['ops_per_s']:>9.1f} {res['peak_kib']:>9.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "machine": f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}",
+                "stages": results,
+            }, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if regressions:
+        for r in regressions:
+            print(f"REGRESSION {r}")
+        sys.exit(1)
+    if baseline is not None:
+        print(f"No regressions against {args.baseline} ({baseline.get('machine', 'unknown machine')})")
+
+if __name__ == "__main__":
+    main()